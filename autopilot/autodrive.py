@@ -0,0 +1,106 @@
+from autopilot.autopilot import Autopilot
+from autopilot.velocity import VelocityController
+
+class AutoDrivePilot(Autopilot):
+    """
+    Obstacle-avoiding cruise: drive until something is within d_threshold,
+    scan for the most open direction, turn there, and back up first if
+    nothing is open. Hardware-free, so it runs on the car
+    (example/autodrive.py) and in the simulator alike.
+
+    Scans use the adaptive_scan, which takes about a third of the time of
+    the full pan_tilt_scan sweep and collides less; clear SCAN_ADAPTIVE for
+    the sweep. See benchmark/scan.py.
+    """
+    SCAN_ADAPTIVE = True
+    TURN_CLEARANCE = 0 # cm a scanned heading must be open beyond d_threshold to turn there, not back up
+
+    def change_state_hook(self):
+        if self.state == self.STATE_CRUISING:
+            # every cruise starts over with the base threshold and the
+            # cruising scan; setting them here rather than on every tick
+            # saves binding a new method object per tick
+            self.d_threshold = self.D_THRESHOLD_BASE
+            self.scan = self.adaptive_scan if self.SCAN_ADAPTIVE else self.pan_tilt_scan
+
+    def on_ready(self):
+        return self.cruise()
+
+    def on_cruising(self):
+        if self.check_obstacle():
+            return self.scan()
+        return self.cruise()
+
+    def on_scanning(self):
+        if self.step >= self.num_steps:
+            self.step = 0
+            if self.max_dist < self.d_threshold + self.TURN_CLEARANCE:
+                self.log("Obstacle too close, backing up, d_threshold: %s, max_dist: %s", self.d_threshold, self.max_dist)
+                self.increase_scan_threshold()
+                self.scan = self.full_rotate_scan
+                return self.back()
+            else:
+                self.debug("Turning to the most open heading, %s", self.target_angle)
+                angle = self.target_angle if self.target_angle < 180 else self.target_angle - 360
+                return self.init_turn(angle)
+        return self.scan()
+
+    def on_turning(self):
+        if self.step >= self.num_steps:
+            self.step = 0
+            return self.cruise()
+        return self.turn()
+
+    def on_backing(self):
+        if not self.check_obstacle():
+            self.step = 0
+            return self.scan()
+        if self.step >= self.num_steps:
+            self.step = 0
+            return self.scan()
+        return self.back()
+
+    def on_stopped(self):
+        return self.stop()
+
+
+class ContinuousDrivePilot(AutoDrivePilot):
+    """
+    AutoDrivePilot that modulates speed and steering continuously with a
+    VelocityController while cruising, and only stops to scan when the way
+    ahead is blocked or the predictor expects it to be (see
+    check_obstacle_predicted). The controller needs its whole corridor
+    clear, so a scanned heading must be open TURN_CLEARANCE beyond
+    d_threshold; a narrower one would only stop it again at once.
+    """
+    TURN_CLEARANCE = 30
+
+    def __init__(self):
+        super().__init__()
+        self.velocity = VelocityController(stop_distance=self.d_threshold)
+
+    def cruise(self):
+        if self.state != self.STATE_CRUISING:
+            self.change_state(self.STATE_CRUISING)
+            self.velocity.reset()
+
+        if self.check_obstacle_critical():
+            self.log("Critical obstacle detected, backing up")
+            return self.back()
+        if self.check_obstacle_predicted():
+            return self.scan()
+        last = self.last_command
+        pan = last.pan if last is not None else 0
+        speed = self.kinematics(last.speed, 0)[0] if last is not None else 0
+        ttc = self.predictor.time_to_collision(self.d_threshold) if self.predictor is not None else float('inf')
+        # the threshold moves with backing up, see increase_scan_threshold()
+        self.velocity.stop_distance = self.d_threshold
+        cmd = self.velocity.command(self.command(), self.now, pan, self.sensor_inputs.lidar_distance,
+                                    self.base_speed, speed, ttc)
+        if cmd is None:
+            return self.scan()
+        self.step += 1
+        return cmd
+
+    def on_cruising(self):
+        return self.cruise()
@@ -1,43 +1,76 @@
-import random, time
+import math, random, time
 from dataclasses import dataclass
+from autopilot.state_machine import StateMachine
+from autopilot.behaviors import BehaviorScheduler
+from autopilot.prediction import ObstaclePredictor
+from autopilot.kinematics import KinematicsTable, KINEMATICS_FILE
 
-@dataclass
+@dataclass(slots=True)
 class Command:
     """
     Class to represent a command for the autopilot.
     This class can be extended to include more parameters as needed.
+    Slotted, and meant to be reused: see set() and Autopilot.command().
     """
     speed: int = 0
     angle: int = 0
     pan: int = 0
     tilt: int = 0
 
-@dataclass
+    def set(self, speed=0, angle=0, pan=0, tilt=0):
+        self.speed = speed
+        self.angle = angle
+        self.pan = pan
+        self.tilt = tilt
+        return self
+
+@dataclass(slots=True)
 class SensorInputs:
     """
     Class to represent sensor inputs for the autopilot.
     This class can be extended to include more sensor data as needed.
+    Slotted; keep one instance and update it every tick.
     """
     ultrasonic_distance: float = float('inf')
+    ultrasonic_age: float = float('inf')  # Seconds since the ultrasonic reading was taken
     lidar_distance: float = float('inf')
     camera_image: bytes = b''  # Placeholder for camera image data
+    detections: tuple = ()  # Newest detections of the perception worker
+    detection_age: float = float('inf')  # Seconds since the detected frame was captured
 
-class Autopilot:
+class Autopilot(StateMachine):
     """
     Class for autopilot functionality.
     This class defines the basic structure and constants for an autopilot system.
     It should be agnostic to the specific vehicle implementation,
     allowing for different vehicles to inherit and implement the methods.
+    Vehicles declare extra STATE_ constants and implement on_<state> handlers,
+    see StateMachine. Multi-step behaviors can instead be submitted to
+    self.behaviors (see BehaviorScheduler); while one is queued it drives
+    the vehicle and the handlers only run when nothing is.
+
+    A steady-state tick allocates nothing: handlers fill in command()
+    instead of creating Commands, and log()/debug() only format their
+    message when it is written.
     """
     D_THREASHOLD_CRITICAL = 15 # Critical distance threshold for obstacle avoidance
     D_THRESHOLD_BASE =35 # Distance threshold for obstacle avoidance
     D_THRESHOLD_INC = 20 # Distance threshold for backing
     FREQ = 0.05 # Frequency autopilot should run at
     STATE_SHIFT_PAUSE = 1.0  # Time in seconds to pause when shifting states
+    TTC_REACTION = 0.1 # Seconds from a lidar reading to the motors slowing down
+    ACCEL_RATE = 200 # Drive power per second the motors speed up at (Picarx.MOTOR_ACCEL)
+    BRAKE_RATE = None # Drive power per second the motors slow down at, None for at once (Picarx.MOTOR_DECEL)
+    SCAN_COARSE = (-30, -15, 15, 30) # Pan angles of the coarse sweep; straight ahead is what is blocked
+    SCAN_REFINE = 7 # Degrees either side of the best coarse angle to probe next
+    SCAN_FREE_DISTANCE = 100 # A heading this open (cm) ends the scan at once
+    SCAN_MIN_TURN = 15 # Degrees the adaptive scan turns at least, so the car gets clear of what it scanned for
+    PAN_SPEED = 240 # Degrees per second the pan servo turns at (Picarx.SERVO_SPEED)
 
     #Vehicle specific constants
     TURN_TIME = 3.0  # Time in seconds to complete a 360 degree
     CRUISE_SPEED = 2.0 # Time in seconds per meter at 100 cruise speed
+    DIR_MAX = 30 # Steering angle at full lock (Picarx.DIR_MAX)
 
     # States for the autopilot
     STATE_READY =  -1
@@ -48,12 +81,10 @@ class Autopilot:
     STATE_BACKING = 4
 
     def __init__(self):
-        self.register_states() 
-        self.state = self.STATE_READY
+        self.init_state_machine(self.STATE_READY)
         self.d_threshold = self.D_THRESHOLD_BASE
         self.cur_speed = 0
         self.cur_angle = 0
-        self.step = 0
         self.num_steps = 200  # Maximum progress for scanning or turning
         self.sensor_inputs = None
         self.dir = 0 
@@ -61,35 +92,80 @@ class Autopilot:
         self.time_started = 0
         self.target_angle = 0
         self.scan = self.pan_tilt_scan
-        self.function_queue = [self.cruise]  # Queue of functions to execute in order
-    
-    def register_states(self):
+        self.behaviors = BehaviorScheduler(save=self._save_context, restore=self._restore_context)
+        self.reflex_event = None  # Set by a safety reflex that stopped the motors
+        self.reflex_tripped = False  # reflex_event as sampled at the start of this tick
+        self.now = 0.0  # clock() at the start of this tick; the time everything in it uses
+        self._next_tick = None  # Deadline of the next tick, see sleep()
+        # Time source for sleep(); a simulator swaps in a virtual clock
+        self.clock = time.monotonic
+        self.wait = time.sleep
+        self.recorder = None  # FlightRecorder fed by run_step, see recorder.py
+        self.predictor = ObstaclePredictor()  # None to react to distance only
+        self.last_command = None
+        # two Commands taking turns, so the previous tick's stays intact
+        self._commands = (Command(), Command())
+        self._command = self._commands[0]
+        self.verbose = False  # write debug() messages
+        self.kinematics_table = None  # Measured response, see load_kinematics()
+
+    def load_kinematics(self, path=KINEMATICS_FILE):
+        """
+        Use the tables of a characterization run (see characterize.py)
+        instead of TURN_TIME and CRUISE_SPEED, if the file exists.
+        """
+        try:
+            self.kinematics_table = KinematicsTable.load(path)
+        except FileNotFoundError:
+            self.log("No kinematics tables at %s, using TURN_TIME and CRUISE_SPEED", path)
+        return self.kinematics_table
+
+    def attach_reflex(self, event):
         """
-        Register a new state for the autopilot.
-        This can be used to extend the autopilot with additional states.
+        Attach the event of a driver-level safety reflex (see driver/reflex.py).
+        While it is set, the autopilot treats it as a critical obstacle.
         """
-        val = 0
-        for attr in dir(self):
-            if attr.startswith('STATE_'):
-                setattr(self, attr, val)
-                val += 1
+        self.reflex_event = event
     
+    def _save_context(self, behavior):
+        return (self.state, self.step, self.num_steps, self.dir, self.target_angle)
+
+    def _restore_context(self, behavior, context):
+        # resuming is not a transition, so no on_state_change
+        self.state, self.step, self.num_steps, self.dir, self.target_angle = context
+
+    def steps(self, start, step=None):
+        """
+        Behavior body running start() once, then step() (start() by default)
+        every tick until self.step reaches self.num_steps.
+
+            self.behaviors.submit("turn", self.steps(lambda: self.init_turn(45), self.turn))
+        """
+        step = step or start
+        self.step = 0
+        yield start()
+        while self.step < self.num_steps:
+            yield step()
+
     def change_state_hook(self):
         return None
 
-    def change_state(self, new_state, init_fun=None, *init_args):
-        '''
-        Call this function when you want to change the state of the autopilot.
-        '''
-        self.state = new_state
-        self.step = 0  # Reset step when changing state
-        #find the name of the state
-        state_name = [attr for attr in dir(self) if getattr(self, attr) == new_state and attr.startswith('STATE_')]
-        self.log(f"State changed to {state_name[0] if state_name else 'UNKNOWN'}")
+    def on_state_change(self, new_state):
+        self.log("State changed to %s", self.STATE_NAMES[new_state])
         self.change_state_hook()
 
     def sleep(self):
-        time.sleep(self.FREQ)  # Sleep for the frequency duration
+        """
+        Sleep until the next tick deadline, FREQ after the previous one, so
+        the time spent in run_step does not stretch the period.
+        """
+        now = self.clock()
+        if self._next_tick is None or now > self._next_tick + self.FREQ:
+            # first tick, or more than a period behind: resync instead of bursting
+            self._next_tick = now
+        elif self._next_tick > now:
+            self.wait(self._next_tick - now)
+        self._next_tick += self.FREQ
 
     def run(self, sensor_inputs: SensorInputs = None):
         """
@@ -100,17 +176,94 @@ class Autopilot:
         return self.run_step(sensor_inputs)
 
     def run_step(self, sensor_inputs: SensorInputs = None):
-        #This can be overridden by the vehicle implementation to run the autopilot
-        raise NotImplementedError("run_step method must be implemented by the vehicle")
+        """
+        Run one step: advance the top behavior, or dispatch to the
+        on_<state> handler of the current state if no behavior is queued.
+        Vehicles implement the handlers; this can still be overridden.
+        """
+        if sensor_inputs is None:
+            raise ValueError("Sensor inputs must be provided")
+        self.sensor_inputs = sensor_inputs
+        # sample the time and the reflex once, so the whole tick sees (and
+        # the recorder keeps) the values it decided on
+        self.now = self.clock()
+        event = self.reflex_event
+        self.reflex_tripped = event is not None and event.is_set()
+        commands = self._commands
+        self._command = commands[commands[0] is self.last_command]
+        self.update_predictor()
+        self.begin_step()
+        cmd = self.behaviors.tick()
+        if cmd is None:
+            cmd = self.dispatch()
+        if self.recorder is not None:
+            self.recorder.record(self.now, sensor_inputs, self.state, self.step, cmd, self.reflex_tripped)
+        self.last_command = cmd
+        return cmd
+
+    def command(self, speed=0, angle=0, pan=0, tilt=0):
+        """
+        This tick's Command, set to the given values. The object is reused
+        every other tick, so copy it to keep it longer (Actuator.submit
+        does).
+        """
+        return self._command.set(speed, angle, pan, tilt)
+
+    def begin_step(self):
+        """
+        Called every tick once the predictor is updated, before any
+        behavior or handler runs; override to update state or submit
+        behaviors. No need to call super(), which would allocate a super
+        object every tick.
+        """
+        return None
+
+    def update_predictor(self):
+        """
+        Feed the predictor this tick's lidar reading if it was taken looking
+        ahead. Readings panned away say nothing about what is ahead, and a
+        wall alongside would look like an obstacle closing in; they are
+        skipped rather than clearing the history, so a weaving lidar still
+        builds one up, and the history ages out on its own.
+        """
+        last = self.last_command
+        if self.predictor is None:
+            return
+        if last is None:
+            self.predictor.reset()
+            return
+        if abs(last.pan) > 2:
+            return
+        self.predictor.update(self.now, self.sensor_inputs.lidar_distance, self.kinematics(last.speed, 0)[0])
     
     def check_obstacle(self):
         """
         Check for obstacles using sensor inputs.
         Returns True if an obstacle is detected, False otherwise.
+        Besides the distance, this fires when the obstacle is predicted to be
+        within d_threshold before the car could stop, so faster cruising
+        brakes earlier and stops at about the same distance.
         """
         if self.sensor_inputs is None:
             raise ValueError("Sensor inputs must be provided")
-        return self.sensor_inputs.lidar_distance < self.d_threshold
+        if self.sensor_inputs.lidar_distance < self.d_threshold:
+            return True
+        return self.check_obstacle_predicted()
+
+    def check_obstacle_predicted(self):
+        """
+        True if the obstacle ahead is predicted to be within d_threshold
+        before the car could stop; the time-to-collision half of
+        check_obstacle(), for pilots that judge the distance themselves.
+        """
+        if self.predictor is None or self.last_command is None:
+            return False
+        # slowing down linearly takes speed / BRAKE_RATE, at half the speed on average
+        speed = self.last_command.speed
+        stopping_time = self.TTC_REACTION
+        if self.BRAKE_RATE is not None and speed > 0:
+            stopping_time += speed / self.BRAKE_RATE / 2
+        return self.predictor.time_to_collision(self.d_threshold) < stopping_time
     
     def check_obstacle_critical(self):
         """
@@ -119,6 +272,8 @@ class Autopilot:
     """
         if self.sensor_inputs is None:
             raise ValueError("Sensor inputs must be provided")
+        if self.reflex_tripped:
+            return True
         return self.sensor_inputs.lidar_distance < self.D_THREASHOLD_CRITICAL
     
     def quick_rotate_scan(self):
@@ -140,11 +295,11 @@ class Autopilot:
 
         if self.max_dist > 100:
             self.step = self.num_steps
-            return Command(0, 0, 0, 0)
+            return self.command(0, 0, 0, 0)
         
         # Turn left and increase progress
         self.step += 1
-        return Command(0, 30, 0, 0)
+        return self.command(0, 30, 0, 0)
     
 
     def full_rotate_scan(self):
@@ -168,11 +323,11 @@ class Autopilot:
 
         if self.max_dist > 100:
             self.step = self.num_steps
-            return Command(0, 0, 0, 0)
+            return self.command(0, 0, 0, 0)
         
         # Turn left and increase progress
         self.step += 1
-        return Command(0, 30, 0, 0)
+        return self.command(0, 30, 0, 0)
     
     def pan_tilt_scan(self):
         """
@@ -201,7 +356,81 @@ class Autopilot:
         pan = -30 + (self.step * 60 / self.num_steps)
         tilt = -10
         self.step += 1
-        return Command(0, 0, pan, tilt)
+        return self.command(0, 0, pan, tilt)
+
+    def adaptive_scan(self):
+        """
+        Coarse-to-fine replacement for pan_tilt_scan with the same contract:
+        it sets max_dist and target_angle, and sets step to num_steps when
+        done.
+
+        The lidar is pointed at the SCAN_COARSE angles, then at SCAN_REFINE
+        either side of the best one, waiting at each for the pan servo to get
+        there. The scan ends as soon as a heading is at least
+        SCAN_FREE_DISTANCE open.
+
+        Only headings at least SCAN_MIN_TURN out are probed: the way ahead
+        is what the scan was started for, and a turn of a few degrees
+        followed by the cruise trim drifts the car straight back into it. If
+        none of them is clear of d_threshold, the scan finishes as a full
+        pan_tilt_scan.
+        """
+        if self.state != self.STATE_SCANNING:
+            self.change_state(self.STATE_SCANNING)
+
+        if self.step == 0:
+            self._scan_fallback = False
+        if self._scan_fallback:
+            return self.pan_tilt_scan()
+
+        if self.step == 0:
+            self.max_dist = -1
+            self.target_angle = 0
+            self.num_steps = 60  # Upper bound, as pan_tilt_scan
+            self._scan_probes = [pan for pan in self.SCAN_COARSE if abs(pan) >= self.SCAN_MIN_TURN]
+            self._scan_done = set()
+            self._scan_refined = False
+            last = self.last_command
+            self._scan_pan = last.pan if last is not None else 0
+            self._scan_next()
+        elif self._scan_settle > 0:
+            self._scan_settle -= 1
+        else:
+            self._scan_record(self._scan_pan, self.sensor_inputs.lidar_distance)
+            if self.max_dist >= self.SCAN_FREE_DISTANCE or not self._scan_next():
+                if self.max_dist <= self.d_threshold:
+                    # nothing worth turning for; look at everything
+                    self._scan_fallback = True
+                    self.step = 0
+                    return self.pan_tilt_scan()
+                self.step = self.num_steps
+                return self.command(0, 0, self._scan_pan, -10)
+
+        self.step += 1
+        return self.command(0, 0, self._scan_pan, -10)
+
+    def _scan_record(self, pan, distance):
+        self._scan_done.add(pan)
+        if distance > self.max_dist:
+            self.max_dist = distance
+            self.target_angle = pan
+
+    def _scan_next(self):
+        """
+        Point the pan at the next probe angle; False when there is none left.
+        """
+        if not self._scan_probes and not self._scan_refined:
+            self._scan_refined = True
+            best = self.target_angle
+            self._scan_probes = [angle for angle in (best - self.SCAN_REFINE, best + self.SCAN_REFINE)
+                                 if self.SCAN_MIN_TURN <= abs(angle) <= 30 and angle not in self._scan_done]
+        if not self._scan_probes:
+            return False
+        pan = self._scan_probes.pop(0)
+        # one tick for the command to reach the servo, then its travel time
+        self._scan_settle = math.ceil(abs(pan - self._scan_pan) / (self.PAN_SPEED * self.FREQ))
+        self._scan_pan = pan
+        return True
 
     def increase_scan_threshold(self):
         self.d_threshold += self.D_THRESHOLD_INC
@@ -215,26 +444,27 @@ class Autopilot:
             self.change_state(self.STATE_TURNING, self.init_turn, angle)
         self.dir = 1 if angle > 0 else -1
         angle = abs(angle)
-        self.num_steps = int(self.TURN_TIME / self.FREQ * angle / 360)  # Number of steps to complete the turn
-        print(f"Turning {'right' if self.dir == 1 else 'left'} for {self.num_steps} steps")
+        rate = abs(self.kinematics(0, self.DIR_MAX)[1])  # turn() spins at full lock
+        self.num_steps = round(angle / rate / self.FREQ)  # Number of steps to complete the turn
+        self.debug("Turning %s for %d steps", 'right' if self.dir == 1 else 'left', self.num_steps)
         return self.turn()
 
     def turn(self):
         #Picarx takes about 3 seconds to turn 360 degrees at 100% power
-        print(self.step, self.num_steps)
+        self.debug("Turn step %d of %d", self.step, self.num_steps)
         self.step +=1
-        return Command(0, 180 * self.dir, 0, 0)
+        return self.command(0, 180 * self.dir, 0, 0)
         
     def stop(self):
         if self.state != self.STATE_STOPPED:
             self.change_state(self.STATE_STOPPED)
-        return Command(0, 0, 0, 0)
+        return self.command(0, 0, 0, 0)
     
     def back(self):
         if self.state != self.STATE_BACKING:
             self.change_state(self.STATE_BACKING)
         self.step += 1
-        return Command(-self.base_speed, 0, 0, 0)
+        return self.command(-self.base_speed, 0, 0, 0)
     
     def cruise(self):
         if self.state != self.STATE_CRUISING:
@@ -244,17 +474,68 @@ class Autopilot:
             self.log("Critical obstacle detected, backing up")
             return self.back()
         self.step += 1
-        return Command(self.base_speed, -1, 0, -5)
+        return self.command(self.base_speed, -1, 0, -5)
     
+    def kinematics(self, speed, angle):
+        """
+        Forward speed (cm/s) and turn rate (degrees per second, clockwise)
+        for a drive power and steering angle. Power is mixed into the wheels
+        the way Picarx does it: a differential of up to 200 at full lock,
+        each wheel clamped to +-100, so a full-lock command at zero speed
+        spins in place. The wheels' speed and the turn rate come from
+        kinematics_table if one is loaded, else from CRUISE_SPEED and
+        TURN_TIME.
+        """
+        # called every tick by the predictor: comparisons rather than
+        # min()/max(), whose argument iterators are allocated
+        steer = -angle if angle < 0 else angle
+        differential = 200 * (steer if steer < self.DIR_MAX else self.DIR_MAX) / self.DIR_MAX
+        if angle < 0:
+            differential = -differential
+        left = speed + differential
+        left = -100 if left < -100 else 100 if left > 100 else left
+        right = speed - differential
+        right = -100 if right < -100 else 100 if right > 100 else right
+        table = self.kinematics_table
+        if table is not None:
+            return table.speed((left + right) / 2), table.turn_rate(speed, angle)
+        return (left + right) / 2 / self.CRUISE_SPEED, (left - right) / 100 * 180 / self.TURN_TIME
+
+    def ramp_power(self, power, target, dt):
+        """
+        Drive power dt seconds on from power, heading for target the way
+        the Picarx motion profiles move it: up at ACCEL_RATE, and down
+        towards 0, including the part of a reversal down to 0, at
+        BRAKE_RATE.
+        """
+        if power != 0 and (target * power <= 0 or abs(target) < abs(power)):
+            floor = target if target * power > 0 else 0
+            if self.BRAKE_RATE is None or abs(floor - power) <= self.BRAKE_RATE * dt:
+                return floor
+            return power + self.BRAKE_RATE * dt if floor > power else power - self.BRAKE_RATE * dt
+        change = self.ACCEL_RATE * dt
+        # runs every tick; min()/max() would allocate
+        step = target - power
+        return power + (-change if step < -change else change if step > change else step)
+
     def get_cruise_dist(self):
         if self.state != self.STATE_CRUISING:
             return 0
-        return self.step * self.FREQ / self.CRUISE_SPEED
+        # meters at base_speed
+        return self.step * self.FREQ * self.kinematics(self.base_speed, 0)[0] / 100
     
-    def log(self, message):
+    def log(self, message, *args):
         """
         Log a message to the console or a file.
+        args are %-formatted into message, only when it is written.
         This method can be overridden to change logging behavior.
         """
-        print(f"[Autopilot] {message}")
+        print("[Autopilot] " + (message % args if args else message))
+
+    def debug(self, message, *args):
+        """
+        log() for per-tick detail, written only when verbose is set.
+        """
+        if self.verbose:
+            self.log(message, *args)
     
@@ -0,0 +1,134 @@
+from collections import deque
+
+
+class Behavior:
+    """
+    A resumable unit of work for BehaviorScheduler.
+
+    body is a generator (or any iterator) yielding one Command per tick;
+    the behavior finishes when it is exhausted. A preempted behavior keeps
+    its generator, so it continues where it left off once it is on top
+    again.
+    """
+
+    def __init__(self, name, body, priority):
+        self.name = name
+        self.body = body
+        self.priority = priority
+        self.cancelled = False
+        self.started = False
+        self.context = None  # Saved by the scheduler while preempted
+
+    def cancel(self):
+        """
+        Cancel the behavior; it is dropped the next time it would run.
+        """
+        self.cancelled = True
+
+    def __repr__(self):
+        return f"Behavior({self.name!r}, priority={self.priority})"
+
+
+class BehaviorScheduler:
+    """
+    Priority scheduler for behaviors, replacing a flat function queue.
+
+    There is one FIFO per priority level. Each tick runs the oldest behavior
+    of the highest non-empty level, so submitting at a higher priority
+    preempts whatever is running, and the preempted behavior resumes after
+    the higher-priority work is done. Behaviors at the same level run in
+    submission order. Cancellation marks the behavior and it is skipped
+    lazily, so a tick costs O(levels) regardless of how much is queued.
+
+    save and restore are called with the preempted behavior, to let the
+    owner stash shared state (e.g. the autopilot's step counters) while
+    another behavior runs.
+    """
+    IDLE = 0
+    NORMAL = 1
+    HIGH = 2
+    CRITICAL = 3
+    LEVELS = 4
+
+    def __init__(self, save=None, restore=None):
+        self.queues = [deque() for _ in range(self.LEVELS)]
+        self.active = None
+        self.save = save
+        self.restore = restore
+        self.preemptions = 0
+        self.completed = 0
+
+    def submit(self, name, body, priority=NORMAL):
+        behavior = Behavior(name, body, priority)
+        self.queues[priority].append(behavior)
+        return behavior
+
+    def submit_first(self, name, body, priority=NORMAL):
+        """
+        Submit ahead of everything already queued at the same priority.
+        """
+        behavior = Behavior(name, body, priority)
+        self.queues[priority].appendleft(behavior)
+        return behavior
+
+    def cancel(self, priority=None):
+        """
+        Cancel every queued behavior, or only those at one priority.
+        """
+        levels = self.queues if priority is None else [self.queues[priority]]
+        for queue in levels:
+            for behavior in queue:
+                behavior.cancel()
+
+    def _top(self):
+        # an index loop, as a reversed() iterator would be allocated every tick
+        queues = self.queues
+        level = self.LEVELS
+        while level:
+            level -= 1
+            queue = queues[level]
+            while queue and queue[0].cancelled:
+                queue.popleft()
+            if queue:
+                return queue[0]
+        return None
+
+    def pending(self):
+        return sum(len(queue) for queue in self.queues)
+
+    def is_running(self, name):
+        return self.active is not None and self.active.name == name
+
+    def tick(self):
+        """
+        Advance the top behavior by one step and return its Command, or None
+        if nothing is queued. A behavior that finishes hands over to the next
+        one within the same tick.
+        """
+        # each pass either returns or retires a behavior, so this ends
+        while True:
+            behavior = self._top()
+            if behavior is None:
+                self.active = None
+                return None
+            if behavior is not self.active:
+                if self.active is not None and not self.active.cancelled:
+                    self.preemptions += 1
+                    if self.save is not None:
+                        self.active.context = self.save(self.active)
+                if behavior.context is not None and self.restore is not None:
+                    self.restore(behavior, behavior.context)
+                    behavior.context = None
+                behavior.started = True
+                self.active = behavior
+            try:
+                return next(behavior.body)
+            except StopIteration:
+                queue = self.queues[behavior.priority]
+                if queue[0] is behavior:
+                    queue.popleft()
+                else:
+                    # something was put in front of it while it ran
+                    queue.remove(behavior)
+                self.completed += 1
+                self.active = None
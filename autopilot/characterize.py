@@ -0,0 +1,165 @@
+from autopilot.autopilot import Autopilot
+from autopilot.kinematics import KinematicsTable
+
+
+def _slope(samples):
+    """
+    Least-squares slope of (time, value) samples, None for fewer than three.
+    """
+    n = len(samples)
+    if n < 3:
+        return None
+    mean_t = sum(t for t, _ in samples) / n
+    mean_v = sum(v for _, v in samples) / n
+    var = sum((t - mean_t) ** 2 for t, _ in samples)
+    if var == 0:
+        return None
+    return sum((t - mean_t) * (v - mean_v) for t, v in samples) / var
+
+
+def _period(values, min_correlation=0.5):
+    """
+    Number of samples after which a series repeats itself, from the first
+    strong peak of its autocorrelation, refined between samples. None if
+    the series does not repeat.
+    """
+    n = len(values)
+    mean = sum(values) / n
+    x = [v - mean for v in values]
+    var = sum(v * v for v in x) / n
+    if var == 0:
+        return None
+    max_lag = n * 2 // 3
+    ac = [sum(x[i] * x[i + lag] for i in range(n - lag)) / (n - lag) / var for lag in range(max_lag)]
+    # skip the peak around lag 0
+    start = next((lag for lag, c in enumerate(ac) if c < 0), None)
+    if start is None:
+        return None
+    peaks = [lag for lag in range(start, max_lag - 1) if ac[lag - 1] <= ac[lag] >= ac[lag + 1]]
+    if not peaks:
+        return None
+    best = max(ac[lag] for lag in peaks)
+    if best < min_correlation:
+        return None
+    lag = next(lag for lag in peaks if ac[lag] >= 0.8 * best)
+    # parabola through the peak and its neighbours
+    a, b, c = ac[lag - 1], ac[lag], ac[lag + 1]
+    curvature = a - 2 * b + c
+    return lag + (0.5 * (a - c) / curvature if curvature else 0.0)
+
+
+class CharacterizationPilot(Autopilot):
+    """
+    Measures how fast the car drives and turns, and builds a
+    KinematicsTable from it (see kinematics.py).
+
+    Set the car down facing a wall 2-3 m away, with room to turn in place.
+
+    Speed: for each of POWERS, the car drives towards the wall for up to
+    SPEED_TIME, stopping MIN_GAP short of it, and reverses until it is back
+    where it started. The lidar distance is fitted over time once the motors
+    have ramped up. The slope is the speed at that power forward, and on the
+    way back the speed in reverse.
+
+    Turn rate: for each of TURN_POWERS and ANGLES, the car turns for about
+    REVOLUTIONS revolutions. The revolution period is the lag at which the
+    lidar's distance profile of the room best repeats itself.
+
+    run_step drives the tests like any pilot, so this runs on the car
+    (example/characterize.py) and in the simulator alike. When done is set,
+    table holds the result.
+    """
+    STATE_CHARACTERIZING = 0
+
+    POWERS = (20, 30, 40, 60, 80, 100)
+    TURN_POWERS = (0, 50)
+    ANGLES = (10, 20, 30)
+    SPEED_TIME = 3.0        # seconds per leg at most
+    MIN_GAP = 40            # cm short of the wall to stop at
+    SETTLE = 0.5            # seconds stopped between tests
+    REVOLUTIONS = 2.5
+    MAX_SPIN_TIME = 20.0    # seconds per turn test at most
+    LIDAR_RANGE = 800       # cm, no echo counts as this far
+
+    def __init__(self):
+        super().__init__()
+        self.predictor = None  # nothing to avoid, the tests drive up to the wall on purpose
+        self.speeds = {}       # power -> cm/s
+        self.turn_rates = {}   # (power, angle) -> degrees per second
+        self.table = None
+        self.done = False
+        self.behaviors.submit("characterize", self.characterizing())
+
+    def measuring_speed(self, power):
+        settle = power / self.ACCEL_RATE + self.TTC_REACTION  # ramping up
+        start = self.now
+        start_distance = self.sensor_inputs.lidar_distance
+        forward = []
+        while self.now - start < self.SPEED_TIME and self.sensor_inputs.lidar_distance > self.MIN_GAP:
+            if self.now - start >= settle and self.sensor_inputs.lidar_distance < self.LIDAR_RANGE:
+                forward.append((self.now, self.sensor_inputs.lidar_distance))
+            yield self.command(power, 0, 0, 0)
+        start = self.now
+        backward = []
+        while self.now - start < 2 * self.SPEED_TIME and self.sensor_inputs.lidar_distance < start_distance:
+            if self.now - start >= 2 * settle and self.sensor_inputs.lidar_distance < self.LIDAR_RANGE:
+                backward.append((self.now, self.sensor_inputs.lidar_distance))
+            yield self.command(-power, 0, 0, 0)
+        for p, samples in ((power, forward), (-power, backward)):
+            slope = _slope(samples)
+            if slope is not None:
+                self.speeds[p] = -slope
+                self.log("Power %d: %.1f cm/s", p, -slope)
+
+    def measuring_turn(self, power, angle):
+        rate = abs(self.kinematics(power, angle)[1])
+        # allow for the car turning at half the rate it is thought to
+        duration = min(self.MAX_SPIN_TIME, 2 * self.REVOLUTIONS * 360 / rate) if rate else self.MAX_SPIN_TIME
+        start = self.now
+        samples = []
+        while self.now - start < duration:
+            if self.now - start >= self.SETTLE:
+                samples.append((self.now, min(self.sensor_inputs.lidar_distance, self.LIDAR_RANGE)))
+            yield self.command(power, angle, 0, 0)
+        period = _period([d for _, d in samples]) if len(samples) > 3 else None
+        if period is None:
+            self.log("Power %d, angle %d: no revolution seen", power, angle)
+            self.turn_rates[(power, angle)] = 0.0
+            return
+        dt = (samples[-1][0] - samples[0][0]) / (len(samples) - 1)
+        self.turn_rates[(power, angle)] = 360 / (period * dt)
+        self.log("Power %d, angle %d: %.1f degrees/s", power, angle, 360 / (period * dt))
+
+    def pausing(self):
+        start = self.now
+        while self.now - start < self.SETTLE:
+            yield self.command(0, 0, 0, 0)
+
+    def characterizing(self):
+        self.change_state(self.STATE_CHARACTERIZING)
+        for power in self.POWERS:
+            yield from self.measuring_speed(power)
+            yield from self.pausing()
+        for power in self.TURN_POWERS:
+            for angle in self.ANGLES:
+                yield from self.measuring_turn(power, angle)
+                yield from self.pausing()
+        self.table = self.build_table()
+        self.done = True
+        yield self.stop()
+
+    def build_table(self):
+        powers = sorted(set(self.speeds) | {0})
+        speed = [self.speeds.get(p, 0.0) for p in powers]
+        angles = [0] + list(self.ANGLES)
+        turn_rate = [[0.0] + [self.turn_rates.get((p, a), 0.0) for a in self.ANGLES] for p in self.TURN_POWERS]
+        return KinematicsTable(powers, speed, self.TURN_POWERS, angles, turn_rate)
+
+    def on_ready(self):
+        return self.stop()
+
+    def on_stopped(self):
+        return self.stop()
+
+    def on_characterizing(self):
+        return self.stop()
@@ -0,0 +1,132 @@
+import math
+
+
+class CoverageMap:
+    """
+    Dead-reckoned grid of the area a pest-control mission has covered.
+
+    The pose starts at the origin, heading along +y; headings and bearings
+    are degrees clockwise, like the pan servo. The map keeps three sets of
+    CELL-sized cells:
+
+        visited   cells the car drove through
+        surveyed  cells inside the camera's view during a fly survey
+        blocked   cells the lidar found an obstacle in
+
+    Cells are only ever added, so the sets grow with the area explored, not
+    with mission time.
+    """
+    CELL = 25  # cm
+
+    def __init__(self, cell=CELL):
+        self.cell = cell
+        self.x = 0.0
+        self.y = 0.0
+        self.heading = 0.0
+        self.odometer = 0.0  # cm driven, either direction
+        self.visited = {(0, 0)}
+        self.surveyed = set()
+        self.blocked = set()
+
+    def cell_at(self, x, y):
+        return (math.floor(x / self.cell), math.floor(y / self.cell))
+
+    def advance(self, speed, turn_rate, dt):
+        """
+        Args:
+            speed (float): forward speed, cm/s
+            turn_rate (float): degrees per second, clockwise
+            dt (float): seconds
+        """
+        heading = self.heading + turn_rate * dt
+        mid = math.radians((self.heading + heading) / 2)
+        self.x += speed * math.sin(mid) * dt
+        self.y += speed * math.cos(mid) * dt
+        self.heading = heading
+        self.odometer += abs(speed) * dt
+        self.visited.add(self.cell_at(self.x, self.y))
+
+    def _point(self, bearing, distance):
+        heading = math.radians(self.heading + bearing)
+        return self.x + distance * math.sin(heading), self.y + distance * math.cos(heading)
+
+    def _sector(self, start, end, radius):
+        """
+        Cells whose center lies within radius and between the bearings
+        start and end, relative to the heading.
+        """
+        size = self.cell
+        x0, y0 = self.cell_at(self.x - radius, self.y - radius)
+        x1, y1 = self.cell_at(self.x + radius, self.y + radius)
+        for cx in range(x0, x1 + 1):
+            dx = (cx + 0.5) * size - self.x
+            for cy in range(y0, y1 + 1):
+                dy = (cy + 0.5) * size - self.y
+                if dx * dx + dy * dy > radius * radius:
+                    continue
+                bearing = (math.degrees(math.atan2(dx, dy)) - self.heading + 180) % 360 - 180
+                if start <= bearing <= end:
+                    yield cx, cy
+
+    def survey(self, start, end, radius):
+        """
+        Mark the sector the camera covered as surveyed.
+
+        Returns:
+            int: number of newly surveyed cells
+        """
+        before = len(self.surveyed)
+        self.surveyed.update(self._sector(start, end, radius))
+        return len(self.surveyed) - before
+
+    def gain(self, start, end, radius):
+        """
+        Fraction of the open cells in a sector that are not surveyed yet.
+        """
+        open_cells = fresh = 0
+        for cell in self._sector(start, end, radius):
+            if cell in self.blocked:
+                continue
+            open_cells += 1
+            if cell not in self.surveyed:
+                fresh += 1
+        return fresh / open_cells if open_cells else 0.0
+
+    def block(self, bearing, distance):
+        """
+        Mark the cell of an obstacle seen at bearing and distance.
+        """
+        self.blocked.add(self.cell_at(*self._point(bearing, distance)))
+
+    def frontier(self):
+        """
+        Open cells that are not surveyed yet but border surveyed ones.
+        """
+        result = set()
+        for cx, cy in self.surveyed:
+            for cell in ((cx + 1, cy), (cx - 1, cy), (cx, cy + 1), (cx, cy - 1)):
+                if cell not in self.surveyed and cell not in self.blocked:
+                    result.add(cell)
+        return result
+
+    def nearest_frontier(self, min_distance=0.0):
+        """
+        Returns:
+            tuple: (bearing, distance) of the closest frontier cell at least
+            min_distance away, or None when there is none
+        """
+        best = None
+        for cx, cy in self.frontier():
+            dx = (cx + 0.5) * self.cell - self.x
+            dy = (cy + 0.5) * self.cell - self.y
+            distance = math.hypot(dx, dy)
+            if distance >= min_distance and (best is None or distance < best[1]):
+                bearing = (math.degrees(math.atan2(dx, dy)) - self.heading + 180) % 360 - 180
+                best = (bearing, distance)
+        return best
+
+    def surveyed_area(self):
+        """
+        Surveyed area in square meters.
+        """
+        return len(self.surveyed) * self.cell * self.cell / 10000
@@ -0,0 +1,70 @@
+import bisect
+import json
+import os
+
+KINEMATICS_FILE = '/opt/picar-x/kinematics.json'  # next to the picar-x config
+
+
+def _interpolate(xs, ys, x):
+    """
+    Piecewise-linear interpolation over sorted xs, clamped at both ends.
+    """
+    if x <= xs[0]:
+        return ys[0]
+    if x >= xs[-1]:
+        return ys[-1]
+    i = bisect.bisect_right(xs, x)
+    x0, x1 = xs[i - 1], xs[i]
+    return ys[i - 1] + (ys[i] - ys[i - 1]) * (x - x0) / (x1 - x0)
+
+
+class KinematicsTable:
+    """
+    Measured response of the car, replacing the single TURN_TIME and
+    CRUISE_SPEED constants of Autopilot.
+
+        speed[i]          cm/s driving straight at wheel power powers[i]
+        turn_rate[i][j]   degrees per second, clockwise, at drive power
+                          turn_powers[i] and steering angle angles[j]
+
+    Lookups interpolate linearly between the measured points. Turns are
+    assumed symmetric: steering left turns as fast as steering right, and
+    reversing turns as fast as driving forward. Tables are written by a
+    characterization run, see autopilot/characterize.py.
+    """
+
+    def __init__(self, powers, speed, turn_powers, angles, turn_rate):
+        self.powers = list(powers)
+        self.speed_table = list(speed)
+        self.turn_powers = list(turn_powers)
+        self.angles = list(angles)
+        self.turn_rate_table = [list(row) for row in turn_rate]
+
+    def speed(self, power):
+        return _interpolate(self.powers, self.speed_table, power)
+
+    def turn_rate(self, power, angle):
+        rows = [_interpolate(self.angles, row, abs(angle)) for row in self.turn_rate_table]
+        rate = _interpolate(self.turn_powers, rows, abs(power))
+        return rate if angle >= 0 else -rate
+
+    def to_dict(self):
+        return {
+            "powers": self.powers,
+            "speed": self.speed_table,
+            "turn_powers": self.turn_powers,
+            "angles": self.angles,
+            "turn_rate": self.turn_rate_table,
+        }
+
+    def save(self, path=KINEMATICS_FILE):
+        # write next to the target and rename, so a crash never leaves half a table
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path=KINEMATICS_FILE):
+        with open(path) as f:
+            return cls(**json.load(f))
@@ -0,0 +1,220 @@
+from autopilot.autodrive import ContinuousDrivePilot
+from autopilot.behaviors import BehaviorScheduler
+from autopilot.coverage import CoverageMap
+
+
+class PestControlPilot(ContinuousDrivePilot):
+    """
+    Pest-control mission: cruise, survey the area for flies and spray the
+    ones found. Hardware-free; the pump is switched through the pump
+    callable, so it runs on the car (example/pest_control.py) and in the
+    simulator alike.
+
+    Surveys are planned on a CoverageMap kept by dead reckoning. Every
+    CoverageMap.CELL of driving, plan() looks at the sectors a survey to
+    either side would see, and surveys the better one if at least
+    SURVEY_GAIN of it has not been surveyed yet. In open areas the car
+    drives a lawnmower pattern of LANE_LENGTH lanes, LANE_SPACING apart.
+    When FRONTIER_DISTANCE went by without anything new to survey, it turns
+    towards the nearest unsurveyed cell next to the surveyed area instead.
+    Obstacles are avoided as by ContinuousDrivePilot.
+    """
+    STATE_FLY_DETECTION = 0
+    STATE_SPRAY_PESTICIDE = 1
+
+    SURVEY_TURN = 45       # degrees to turn towards the side surveyed
+    SURVEY_SPAN = 60       # degrees either side of the camera's sweep center it sees
+    SURVEY_RANGE = 120     # cm the camera spots flies at
+    SURVEY_GAIN = 0.5      # unsurveyed fraction of a sector worth a survey
+    LANE_LENGTH = 400      # cm
+    LANE_SPACING = 200     # cm, twice the reach of a survey across the lane
+    LANE_HEADING = 20      # degrees off the lane that start a new one
+    FRONTIER_DISTANCE = 200  # cm without a survey before heading for the frontier
+
+    def __init__(self, pump=None):
+        """
+        Args:
+            pump: callable taking True to start spraying and False to stop
+        """
+        super().__init__()
+        self.pump = pump
+        self.coverage = CoverageMap()
+        self.lane_side = 1
+        self.lane_start = 0.0
+        self.lane_heading = 0.0
+        self.planned_at = 0.0
+        self.surveyed_at = 0.0
+        self.surveys = 0
+        self.started = None
+        self._reckoned_at = None
+        self._power = 0.0
+
+    def on_state_change(self, new_state):
+        super().on_state_change(new_state)
+        coverage = self.coverage
+        off_lane = abs((coverage.heading - self.lane_heading + 180) % 360 - 180)
+        if new_state == self.STATE_CRUISING and off_lane > self.LANE_HEADING:
+            # turned onto a new lane, e.g. around an obstacle
+            self.lane_start = coverage.odometer
+            self.lane_heading = coverage.heading
+
+    def dead_reckon(self):
+        """
+        Advance the coverage map by the last command, with the drive power
+        ramping as the motion profiles do (Autopilot.ramp_power).
+        """
+        now = self.now
+        last = self.last_command
+        if self.started is None:
+            self.started = now
+        if last is not None and self._reckoned_at is not None:
+            dt = now - self._reckoned_at
+            power = self.ramp_power(self._power, last.speed, dt)
+            speed, turn_rate = self.kinematics((self._power + power) / 2, last.angle)
+            self._power = power
+            self.coverage.advance(speed, turn_rate, dt)
+        self._reckoned_at = now
+
+    def coverage_rate(self):
+        """
+        Surveyed square meters per minute since the mission started.
+        """
+        if self.started is None or self.clock() <= self.started:
+            return 0.0
+        return self.coverage.surveyed_area() / (self.clock() - self.started) * 60
+
+    def pump_on(self, on):
+        if self.pump is not None:
+            self.pump(on)
+        self.log("Pesticide spray %s", 'activated' if on else 'deactivated')
+
+    def spray_pesticide(self):
+        if self.state != self.STATE_SPRAY_PESTICIDE:
+            self.change_state(self.STATE_SPRAY_PESTICIDE)
+
+        # Initialize scan if not already started
+        if self.step == 0:
+            self.num_steps = 60
+            self.pump_on(True)
+
+        pan = -30 + (self.step * 60 / self.num_steps)
+        tilt = -10
+        self.step += 1
+        return self.command(0, 0, pan, tilt)
+
+    def fly_detect(self):
+        if self.state != self.STATE_FLY_DETECTION:
+            self.change_state(self.STATE_FLY_DETECTION)
+
+        # Initialize scan if not already started
+        if self.step == 0:
+            self.num_steps = 60
+
+        # Detections come from the perception worker; only trust frames
+        # captured since this scan started
+        if self.sensor_inputs.detections and self.sensor_inputs.detection_age <= self.step * self.FREQ:
+            #early exit if fly detected
+            self.step=self.num_steps
+            # preempts the rest of the scan, which resumes afterwards
+            self.behaviors.submit("spray", self.spraying(), BehaviorScheduler.HIGH)
+
+        pan = -30 + (self.step * 60 / self.num_steps)
+        tilt = -10
+        self.step += 1
+        return self.command(0, 0, pan, tilt)
+
+    def spraying(self):
+        yield from self.steps(self.spray_pesticide)
+        self.pump_on(False)
+
+    def turning(self, angle):
+        return self.steps(lambda: self.init_turn(angle), self.turn)
+
+    def surveying(self, side):
+        """
+        Turn SURVEY_TURN towards side (1 right, -1 left), sweep the camera
+        for flies and turn back.
+        """
+        self.surveys += 1
+        self.surveyed_at = self.coverage.odometer
+        yield from self.turning(self.SURVEY_TURN * side)
+        yield from self.steps(self.fly_detect)
+        self.coverage.survey(-self.SURVEY_SPAN, self.SURVEY_SPAN, self.SURVEY_RANGE)
+        yield from self.turning(-self.SURVEY_TURN * side)
+
+    def shifting(self, distance):
+        """
+        Cruise straight for distance cm, or until the way is blocked.
+        """
+        start = self.coverage.odometer
+        while self.coverage.odometer - start < distance and not self.check_obstacle():
+            cmd = self.cruise()
+            yield cmd
+            if self.state != self.STATE_CRUISING:
+                return
+
+    def plan(self):
+        """
+        Queue the next survey or maneuver, if one is due.
+
+        Returns:
+            bool: whether behaviors were submitted
+        """
+        coverage = self.coverage
+        turn, span, reach = self.SURVEY_TURN, self.SURVEY_SPAN, self.SURVEY_RANGE
+        side = self.lane_side
+        gain = coverage.gain(turn * side - span, turn * side + span, reach)
+        other = coverage.gain(-turn * side - span, -turn * side + span, reach)
+        # a tie goes right, as max() over (gain, side) had it
+        if other > gain or (other == gain and side < 0):
+            gain, side = other, -side
+        if gain >= self.SURVEY_GAIN:
+            self.behaviors.submit("survey", self.surveying(side))
+            return True
+
+        if coverage.odometer - self.lane_start >= self.LANE_LENGTH:
+            # lawnmower: turn around onto the neighbouring lane
+            side = self.lane_side
+            self.lane_side = -side
+            self.behaviors.submit("lane_turn", self.turning(90 * side))
+            self.behaviors.submit("lane_shift", self.shifting(self.LANE_SPACING))
+            self.behaviors.submit("lane_turn", self.turning(90 * side))
+            return True
+
+        if coverage.odometer - self.surveyed_at >= self.FRONTIER_DISTANCE:
+            self.surveyed_at = coverage.odometer
+            frontier = coverage.nearest_frontier(min_distance=coverage.cell * 2)
+            if frontier is not None and abs(frontier[0]) > self.LANE_HEADING:
+                self.log("Heading for the frontier %.0f cm away at %.0f degrees", frontier[1], frontier[0])
+                self.behaviors.submit("frontier", self.turning(frontier[0]))
+                return True
+        return False
+
+    def avoiding(self):
+        self.log("Critical obstacle detected, backing up")
+        yield self.back()
+        self.num_steps = int(1.0 / self.FREQ)  # Back up for at most a second
+        while self.check_obstacle() and self.step < self.num_steps:
+            yield self.back()
+
+    def begin_step(self):
+        self.dead_reckon()
+        # an obstacle preempts whatever is running, e.g. a survey
+        if self.check_obstacle_critical() and not self.behaviors.is_running("avoid"):
+            self.behaviors.submit("avoid", self.avoiding(), BehaviorScheduler.CRITICAL)
+
+    def on_cruising(self):
+        coverage = self.coverage
+        distance = self.sensor_inputs.lidar_distance
+        if distance < self.SURVEY_RANGE and self.last_command is not None:
+            coverage.block(self.last_command.pan, distance)
+        if coverage.odometer - self.planned_at >= coverage.cell:
+            self.planned_at = coverage.odometer
+            if self.plan():
+                return self.stop()
+        # what ContinuousDrivePilot.on_cruising does, without allocating a
+        # super object every tick
+        return self.cruise()
+
+    def on_stopped(self):
+        return self.cruise()
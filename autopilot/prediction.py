@@ -0,0 +1,100 @@
+class ObstaclePredictor:
+    """
+    Time-to-collision estimate for the obstacle ahead.
+
+    Keeps the last WINDOW seconds of (time, distance ahead), fed by
+    Autopilot.update_predictor() while the lidar looks ahead, and fits the closing speed to them by least
+    squares. The commanded speed is a floor, so braking starts before the
+    history has caught up with an acceleration. An approaching obstacle
+    shows up in the measured speed even while the car stands still.
+
+    The history lives in preallocated ring buffers of CAPACITY samples, so
+    updates and estimates allocate nothing.
+    """
+    WINDOW = 0.5       # seconds of history
+    MIN_SAMPLES = 3
+    CAPACITY = 64      # samples, well over WINDOW at the tick rate
+
+    def __init__(self, window=WINDOW, capacity=CAPACITY):
+        self.window = window
+        self.times = [0.0] * capacity
+        self.distances = [0.0] * capacity
+        self.start = 0   # index of the oldest sample
+        self.count = 0
+        self.commanded = 0.0  # cm/s towards the obstacle
+
+    def reset(self):
+        self.count = 0
+        self.commanded = 0.0
+
+    def update(self, t, distance, commanded):
+        """
+        Args:
+            t (float): monotonic time of the reading
+            distance (float): lidar distance ahead in cm, inf for no echo
+            commanded (float): commanded forward speed in cm/s
+        """
+        self.commanded = commanded
+        if distance == float('inf'):
+            self.count = 0
+            return
+        capacity = len(self.times)
+        if self.count == capacity:
+            self.start = (self.start + 1) % capacity
+            self.count -= 1
+        i = (self.start + self.count) % capacity
+        self.times[i] = t
+        self.distances[i] = distance
+        self.count += 1
+        times = self.times
+        while t - times[self.start] > self.window:
+            self.start = (self.start + 1) % capacity
+            self.count -= 1
+
+    def closing_speed(self):
+        """
+        Speed at which the obstacle gets closer, cm/s; negative if it recedes.
+        """
+        n = self.count
+        if n < self.MIN_SAMPLES:
+            return self.commanded
+        times, distances = self.times, self.distances
+        capacity = len(times)
+        # plain index loops, as generator expressions would be allocated
+        sum_t = sum_d = 0.0
+        k = 0
+        while k < n:
+            i = (self.start + k) % capacity
+            sum_t += times[i]
+            sum_d += distances[i]
+            k += 1
+        mean_t = sum_t / n
+        mean_d = sum_d / n
+        var = cov = 0.0
+        k = 0
+        while k < n:
+            i = (self.start + k) % capacity
+            dt = times[i] - mean_t
+            var += dt * dt
+            cov += dt * (distances[i] - mean_d)
+            k += 1
+        if var == 0:
+            return self.commanded
+        speed = -cov / var
+        # not max(), which allocates its argument tuple
+        return speed if speed > self.commanded else self.commanded
+
+    def time_to_collision(self, margin=0.0):
+        """
+        Seconds until the obstacle is within margin cm, inf if not closing.
+        """
+        if not self.count:
+            return float('inf')
+        newest = (self.start + self.count - 1) % len(self.times)
+        gap = self.distances[newest] - margin
+        if gap <= 0:
+            return 0.0
+        speed = self.closing_speed()
+        if speed <= 0:
+            return float('inf')
+        return gap / speed
@@ -0,0 +1,140 @@
+import json
+import os
+import time
+from collections import deque
+
+PROFILE_ENV = "AUTOPILOT_PROFILE"            # set to enable the profiler
+PROFILE_JSON_ENV = "AUTOPILOT_PROFILE_JSON"  # file to write summaries to
+
+
+class _Span:
+    __slots__ = ("samples", "start")
+
+    def __init__(self, samples):
+        self.samples = samples
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.samples.append(time.perf_counter() - self.start)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class PhaseProfiler:
+    """
+    Times the phases of the control loop (sensor acquisition, decision,
+    perception, actuation) and keeps a rolling window of durations per
+    phase, summarized as percentiles and a histogram.
+
+        profiler = PhaseProfiler()
+        with profiler.span("sensors"):
+            ...
+        profiler.record("perception", worker.inference_time)
+        profiler.report(ap.log)
+
+    When disabled, span() returns a shared no-op context manager and
+    record() returns at once, so instrumented code costs a method call per
+    phase. A span is not reentrant: time each phase from one thread.
+    """
+    WINDOW = 512
+    # Histogram bucket upper bounds, milliseconds
+    BUCKETS_MS = (0.1, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, float('inf'))
+
+    def __init__(self, enabled=None, json_path=None, window=WINDOW):
+        """
+        Args:
+            enabled (bool): defaults to whether AUTOPILOT_PROFILE is set
+            json_path (str): also write each report() here, defaults to
+                             AUTOPILOT_PROFILE_JSON
+        """
+        if enabled is None:
+            enabled = bool(os.environ.get(PROFILE_ENV))
+        self.enabled = enabled
+        self.json_path = json_path if json_path is not None else os.environ.get(PROFILE_JSON_ENV)
+        self.window = window
+        self._samples = {}
+        self._spans = {}
+
+    def _window(self, phase):
+        samples = self._samples.get(phase)
+        if samples is None:
+            samples = self._samples[phase] = deque(maxlen=self.window)
+        return samples
+
+    def span(self, phase):
+        if not self.enabled:
+            return _NULL_SPAN
+        span = self._spans.get(phase)
+        if span is None:
+            span = self._spans[phase] = _Span(self._window(phase))
+        return span
+
+    def record(self, phase, seconds):
+        """
+        Add a duration measured elsewhere, e.g. in another process.
+        """
+        if self.enabled and seconds is not None:
+            self._window(phase).append(seconds)
+
+    def summary(self):
+        """
+        Per phase: sample count, mean/p50/p99/max in milliseconds and
+        histogram counts per BUCKETS_MS bound.
+        """
+        result = {}
+        # phases may be recorded from other threads meanwhile, so copy first
+        for phase, samples in list(self._samples.items()):
+            ordered = sorted(list(samples))
+            n = len(ordered)
+            if not n:
+                continue
+            histogram = [0] * len(self.BUCKETS_MS)
+            bucket = 0
+            for sample in ordered:
+                while sample * 1000 > self.BUCKETS_MS[bucket]:
+                    bucket += 1
+                histogram[bucket] += 1
+            result[phase] = {
+                "count": n,
+                "mean": sum(ordered) / n * 1000,
+                "p50": ordered[n // 2] * 1000,
+                "p99": ordered[min(n - 1, int(n * 0.99))] * 1000,
+                "max": ordered[-1] * 1000,
+                "histogram": histogram,
+            }
+        return result
+
+    def format(self):
+        lines = []
+        for phase, st in self.summary().items():
+            lines.append(f"{phase}: p50 {st['p50']:.2f} ms, p99 {st['p99']:.2f} ms, "
+                         f"max {st['max']:.2f} ms over {st['count']} samples")
+        return "\n".join(lines)
+
+    def report(self, log=print):
+        """
+        Log the summary and write it to json_path if set. No-op when disabled.
+        """
+        if not self.enabled:
+            return
+        log(self.format())
+        if self.json_path:
+            report = {"buckets_ms": [str(b) for b in self.BUCKETS_MS], "phases": self.summary()}
+            with open(self.json_path, "w") as f:
+                json.dump(report, f, indent=2)
@@ -0,0 +1,120 @@
+import signal
+import sys
+import time
+import numpy as np
+
+TICK_DTYPE = np.dtype([
+    ("time", "f8"),             # monotonic seconds
+    ("lidar_distance", "f4"),
+    ("ultrasonic_distance", "f4"),
+    ("ultrasonic_age", "f4"),
+    ("detections", "u2"),       # number of detections
+    ("detection_x", "i2"),      # center of the best detection, -1 if none
+    ("detection_y", "i2"),
+    ("detection_age", "f4"),
+    ("state", "i2"),
+    ("step", "i4"),
+    ("speed", "f4"),
+    ("angle", "f4"),
+    ("pan", "f4"),
+    ("tilt", "f4"),
+    ("reflex", "?"),            # the safety reflex had tripped
+])
+
+
+class FlightRecorder:
+    """
+    Fixed-size ring buffer of autopilot ticks.
+
+    Every tick's time, SensorInputs, reflex state, state, step and Command
+    go into one preallocated numpy structured array, overwriting the
+    oldest tick once it is full, so recording costs a single row
+    assignment and memory stays constant. The time is the one run_step
+    read at the start of the tick and used throughout it. The buffer is dumped as an .npz file on demand, and
+    after install() also on an uncaught exception, SIGUSR1 or SIGTERM.
+
+        recorder = FlightRecorder(state_names=ap.STATE_NAMES).install()
+        ap.recorder = recorder
+        ...
+        ticks, state_names = load("/tmp/flight.npz")
+        ticks["lidar_distance"][ticks["state"] == 1]
+    """
+    CAPACITY = 30000  # 25 minutes at 20 Hz, ~1.5 MB
+    PATH = "/tmp/flight-%Y%m%d-%H%M%S.npz"
+
+    def __init__(self, capacity=CAPACITY, path=PATH, state_names=()):
+        """
+        Args:
+            capacity (int): number of ticks kept
+            path (str): dump file, strftime() placeholders are filled in at dump time
+            state_names: names of the state numbers, saved along for analysis
+        """
+        self.buffer = np.zeros(capacity, dtype=TICK_DTYPE)
+        self.capacity = capacity
+        self.path = path
+        self.state_names = tuple(state_names)
+        self.count = 0  # Ticks recorded so far, including overwritten ones
+
+    def record(self, t, sensor_inputs, state, step, cmd, reflex=False):
+        detections = sensor_inputs.detections
+        if detections:
+            x, y = detections[0][0], detections[0][1]
+        else:
+            x = y = -1
+        self.buffer[self.count % self.capacity] = (
+            t, sensor_inputs.lidar_distance, sensor_inputs.ultrasonic_distance,
+            sensor_inputs.ultrasonic_age, len(detections), x, y, sensor_inputs.detection_age,
+            state, step, cmd.speed, cmd.angle, cmd.pan, cmd.tilt, reflex)
+        self.count += 1
+
+    def ticks(self):
+        """
+        Recorded ticks, oldest first, as a copy of the buffer.
+        """
+        if self.count <= self.capacity:
+            return self.buffer[:self.count].copy()
+        start = self.count % self.capacity
+        return np.concatenate((self.buffer[start:], self.buffer[:start]))
+
+    def dump(self, path=None):
+        """
+        Write the recorded ticks to an .npz file and return its path.
+        """
+        path = time.strftime(path or self.path)
+        np.savez_compressed(path, ticks=self.ticks(), state_names=np.array(self.state_names, dtype=str))
+        print(f"[Recorder] {min(self.count, self.capacity)} ticks dumped to {path}")
+        return path
+
+    def install(self, signals=(signal.SIGUSR1, signal.SIGTERM)):
+        """
+        Dump on an uncaught exception and on the given signals; SIGUSR1
+        dumps and carries on, SIGTERM dumps and exits. Call from the main
+        thread.
+        """
+        previous_hook = sys.excepthook
+
+        def excepthook(*exc_info):
+            self.dump()
+            previous_hook(*exc_info)
+
+        def on_signal(signum, frame):
+            self.dump()
+            if signum == signal.SIGTERM:
+                raise SystemExit(128 + signum)
+
+        sys.excepthook = excepthook
+        for signum in signals:
+            signal.signal(signum, on_signal)
+        return self
+
+
+def load(path):
+    """
+    Load a dump written by FlightRecorder.dump().
+
+    Returns:
+        tuple: (ticks, state_names); ticks is a structured array, so
+        ticks["speed"] is the speed of every tick as a plain array
+    """
+    with np.load(path) as data:
+        return data["ticks"], tuple(str(name) for name in data["state_names"])
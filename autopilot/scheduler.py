@@ -0,0 +1,140 @@
+import time
+from collections import deque
+
+
+class Task:
+    """
+    A periodic task run by RateScheduler.
+
+    Overrun policies, applied when a run ends past the task's next deadline:
+      SKIP      drop the missed periods and realign to the original grid
+      CATCH_UP  run the missed periods back to back, at most MAX_CATCH_UP
+    """
+    SKIP = "skip"
+    CATCH_UP = "catch_up"
+    MAX_CATCH_UP = 3
+    STATS_WINDOW = 512
+
+    def __init__(self, name, period, fn, policy=SKIP):
+        if policy not in (self.SKIP, self.CATCH_UP):
+            raise ValueError(f"Unknown overrun policy: {policy}")
+        self.name = name
+        self.period = period
+        self.fn = fn
+        self.policy = policy
+        self.deadline = 0.0
+        self.runs = 0
+        self.overruns = 0
+        self.skipped = 0
+        self.jitter = deque(maxlen=self.STATS_WINDOW)  # start - deadline
+        self.exec_time = deque(maxlen=self.STATS_WINDOW)
+
+    def reschedule(self, now):
+        """
+        Advance the deadline after a run that finished at `now`.
+        """
+        self.deadline += self.period
+        if now <= self.deadline:
+            return
+        self.overruns += 1
+        missed = int((now - self.deadline) // self.period) + 1
+        if self.policy == self.SKIP:
+            self.skipped += missed
+            self.deadline += missed * self.period
+        elif missed > self.MAX_CATCH_UP:
+            # too far behind to catch up, drop the excess
+            dropped = missed - self.MAX_CATCH_UP
+            self.skipped += dropped
+            self.deadline += dropped * self.period
+
+    def stats(self):
+        def summary(samples):
+            if not samples:
+                return {"mean": 0.0, "p99": 0.0, "max": 0.0}
+            ordered = sorted(samples)
+            return {
+                "mean": sum(ordered) / len(ordered) * 1000,
+                "p99": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000,
+                "max": ordered[-1] * 1000,
+            }
+        return {
+            "rate_hz": 1.0 / self.period,
+            "runs": self.runs,
+            "overruns": self.overruns,
+            "skipped": self.skipped,
+            "jitter_ms": summary(self.jitter),
+            "exec_ms": summary(self.exec_time),
+        }
+
+
+class RateScheduler:
+    """
+    Runs tasks at independent rates against absolute monotonic deadlines.
+
+    Each task's deadlines sit on a fixed grid (start + k * period), so time
+    spent in the tasks themselves does not make the period drift. The task
+    with the earliest deadline runs next; ties go to the task added first,
+    so add the most urgent ones first.
+
+        scheduler = RateScheduler()
+        scheduler.add("safety", 50, check_safety)
+        scheduler.add("plan", 20, plan)
+        scheduler.add("perception", 5, detect, policy=Task.SKIP)
+        scheduler.run()
+
+    clock and sleep can be replaced, e.g. by a virtual clock in simulation.
+    """
+
+    def __init__(self, clock=time.monotonic, sleep=time.sleep):
+        self.clock = clock
+        self.sleep = sleep
+        self.tasks = []
+        self.running = False
+
+    def add(self, name, rate_hz, fn, policy=Task.SKIP):
+        task = Task(name, 1.0 / rate_hz, fn, policy)
+        task.deadline = self.clock()
+        self.tasks.append(task)
+        return task
+
+    def run_once(self):
+        """
+        Wait for the earliest deadline and run that task.
+        """
+        task = min(self.tasks, key=lambda t: t.deadline)
+        delay = task.deadline - self.clock()
+        if delay > 0:
+            self.sleep(delay)
+        start = self.clock()
+        task.jitter.append(start - task.deadline)
+        task.fn()
+        end = self.clock()
+        task.exec_time.append(end - start)
+        task.runs += 1
+        task.reschedule(end)
+        return task
+
+    def run(self, duration=None):
+        """
+        Run until stop() is called, or for `duration` seconds.
+        """
+        self.running = True
+        end = None if duration is None else self.clock() + duration
+        while self.running and (end is None or self.clock() < end):
+            self.run_once()
+
+    def stop(self):
+        self.running = False
+
+    def stats(self):
+        return {task.name: task.stats() for task in self.tasks}
+
+    def summary(self):
+        """
+        One line per task: runs, overruns, skipped and p99 jitter.
+        """
+        lines = []
+        for name, st in self.stats().items():
+            lines.append(f"{name}: {st['runs']} runs, {st['overruns']} overruns, {st['skipped']} skipped, "
+                         f"jitter p99 {st['jitter_ms']['p99']:.1f} ms, exec p99 {st['exec_ms']['p99']:.1f} ms")
+        return "\n".join(lines)
@@ -0,0 +1,86 @@
+from enum import IntEnum
+
+
+class StateMachine:
+    """
+    Base class for declarative state machines.
+
+    Subclasses declare states as integer STATE_<NAME> class attributes and
+    handle them with on_<name> methods. When the class is created, every
+    state in the class hierarchy is numbered once (base class states first,
+    in declaration order), STATE_<NAME> is rebound to a member of the
+    generated `State` IntEnum, and a dispatch table indexed by state is
+    built. Stepping and changing state are then plain list lookups.
+
+        class Pilot(StateMachine):
+            STATE_IDLE = 0
+            STATE_DRIVING = 1
+
+            def on_idle(self):
+                ...
+
+    The value given to a STATE_ attribute is replaced; only integers count
+    as states, so constants such as STATE_SHIFT_PAUSE = 1.0 are left
+    alone.
+    """
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        names = []
+        for klass in reversed(cls.__mro__):
+            for attr, value in vars(klass).items():
+                if (attr.startswith('STATE_') and isinstance(value, int)
+                        and not isinstance(value, bool) and attr[6:] not in names):
+                    names.append(attr[6:])
+        cls.State = IntEnum(cls.__name__ + 'State', [(name, i) for i, name in enumerate(names)])
+        for member in cls.State:
+            setattr(cls, 'STATE_' + member.name, member)
+        cls.STATE_NAMES = tuple(names)
+        cls._dispatch = tuple(getattr(cls, 'on_' + name.lower(), None) for name in names)
+
+    def init_state_machine(self, state):
+        self.state = state
+        self.step = 0
+        n = len(self.STATE_NAMES)
+        # transitions[from][to] and ticks spent in each state
+        self.transitions = [[0] * n for _ in range(n)]
+        self.state_ticks = [0] * n
+
+    def state_name(self, state=None):
+        return self.STATE_NAMES[self.state if state is None else state]
+
+    def change_state(self, new_state, init_fun=None, *init_args):
+        '''
+        Call this function when you want to change the state of the autopilot.
+        '''
+        self.transitions[self.state][new_state] += 1
+        self.state = new_state
+        self.step = 0  # Reset step when changing state
+        self.on_state_change(new_state)
+
+    def on_state_change(self, new_state):
+        """
+        Called after every transition; override to log or react.
+        """
+        return None
+
+    def dispatch(self):
+        """
+        Run the handler of the current state and return its result.
+        """
+        state = self.state
+        self.state_ticks[state] += 1
+        handler = self._dispatch[state]
+        if handler is None:
+            raise NotImplementedError(f"No handler on_{self.STATE_NAMES[state].lower()} "
+                                      f"for state {self.STATE_NAMES[state]}")
+        return handler(self)
+
+    def transition_counts(self):
+        """
+        Transition counters by state name, e.g. {('CRUISING', 'SCANNING'): 3}.
+        """
+        names = self.STATE_NAMES
+        return {(names[a], names[b]): count
+                for a, row in enumerate(self.transitions)
+                for b, count in enumerate(row) if count}
@@ -0,0 +1,121 @@
+import math
+
+
+def _clamp(x, low, high):
+    # comparisons rather than min()/max(), whose argument tuples are allocated
+    return low if x < low else high if x > high else x
+
+
+class VelocityController:
+    """
+    Continuous speed and steering from the lidar, for cruising without
+    stop-scan-go.
+
+    While cruising, the pan servo weaves the lidar through WEAVE, and the
+    newest reading per pan angle is kept. A reading ages by the distance
+    driven since it was taken. Speed scales linearly with the clearance
+    ahead (the nearest reading within CORRIDOR of the car's path, so a
+    wall alongside does not count however close): base speed beyond
+    SLOW_DISTANCE, down to MIN_SPEED just above STOP_DISTANCE. It scales
+    the same way with the predicted time until the way ahead closes to
+    STOP_DISTANCE, from base speed beyond SLOW_TIME, so an obstacle that
+    closes in faster than the car drives slows it down sooner. Steering
+    leans towards the more open side, by up to MAX_STEER.
+
+    command() returns None once the way ahead is within STOP_DISTANCE; the
+    pilot then falls back to stopping and scanning.
+    """
+    WEAVE = (0, 10, 20, 10, 0, -10, -20, -10)  # Pan angles, one per tick
+    CORRIDOR = 15          # cm either side of the path that count as ahead
+    SLOW_DISTANCE = 60     # cm, full speed beyond
+    STOP_DISTANCE = 35     # cm
+    SLOW_TIME = 1.5        # seconds to STOP_DISTANCE, full speed beyond
+    MIN_SPEED = 20         # power, below this the motors stall
+    MAX_STEER = 8          # degrees
+    STALE = 1.0            # seconds a reading is kept
+    PAN_RANGE = 30         # degrees either side the pan servo reaches
+
+    def __init__(self, stop_distance=STOP_DISTANCE, slow_distance=SLOW_DISTANCE):
+        self.stop_distance = stop_distance
+        self.slow_distance = slow_distance
+        # newest reading per whole pan angle, indexed by pan + PAN_RANGE
+        slots = 2 * self.PAN_RANGE + 1
+        self.distances = [0.0] * slots
+        self.times = [float('-inf')] * slots
+        # of each slot's angle off the heading, to place its reading
+        self.sines = [abs(math.sin(math.radians(i - self.PAN_RANGE))) for i in range(slots)]
+        self.cosines = [math.cos(math.radians(i - self.PAN_RANGE)) for i in range(slots)]
+        self.phase = 0
+
+    def reset(self):
+        """
+        Forget all readings, e.g. after turning.
+        """
+        times = self.times
+        for i in range(len(times)):
+            times[i] = float('-inf')
+        self.phase = 0
+
+    def command(self, cmd, now, pan, distance, base_speed, speed, ttc=float('inf')):
+        """
+        Args:
+            cmd (Command): filled in and returned
+            now (float): time of the reading
+            pan (float): pan angle the reading was taken at
+            distance (float): lidar distance, cm
+            base_speed (int): cruise power
+            speed (float): current forward speed, cm/s
+            ttc (float): predicted seconds until the way ahead is within
+                stop_distance
+        Returns:
+            Command, or None when the way ahead is blocked
+        """
+        # slots and their bounds are kept non-negative, as ints below -5 are
+        # allocated; round() would allocate its argument tuple
+        rng = self.PAN_RANGE
+        slot = int(_clamp(pan + rng, 0, 2 * rng) + 0.5)
+        self.distances[slot] = distance
+        self.times[slot] = now
+
+        # clearances of the fresh readings, shortened by the distance driven since
+        forward = self.slow_distance
+        left = right = 0.0
+        n_left = n_right = 0
+        if speed < 0:
+            speed = 0.0
+        distances, times = self.distances, self.times
+        sines, cosines = self.sines, self.cosines
+        # an index loop, as an iterator would be allocated every tick
+        i = len(times)
+        while i:
+            i -= 1
+            age = now - times[i]
+            if age > self.STALE:
+                continue
+            reach = distances[i] - speed * age
+            clear = _clamp(reach, 0.0, self.slow_distance)
+            # in the way if it lies within CORRIDOR of the car's path
+            if reach * sines[i] < self.CORRIDOR and reach * cosines[i] < forward:
+                forward = reach * cosines[i]
+            if i < rng:
+                left += clear
+                n_left += 1
+            elif i > rng:
+                right += clear
+                n_right += 1
+        if forward <= self.stop_distance:
+            return None
+
+        scale = _clamp((forward - self.stop_distance) / (self.slow_distance - self.stop_distance), 0.0, 1.0)
+        if ttc < self.SLOW_TIME * scale:
+            scale = ttc / self.SLOW_TIME
+        power = _clamp(base_speed * scale, self.MIN_SPEED, base_speed)
+
+        left = left / n_left if n_left else self.slow_distance
+        right = right / n_right if n_right else self.slow_distance
+        lean = (right - left) / (self.slow_distance - self.stop_distance)
+        steer = _clamp(lean, -1.0, 1.0) * self.MAX_STEER
+
+        next_pan = self.WEAVE[self.phase]
+        self.phase = (self.phase + 1) % len(self.WEAVE)
+        return cmd.set(power, steer, next_pan, -5)
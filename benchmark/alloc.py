@@ -0,0 +1,184 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+from autopilot.autopilot import SensorInputs
+from autopilot.recorder import FlightRecorder
+from simulation.runner import VirtualClock, load_pilot
+import argparse
+import contextlib
+import gc
+import tracemalloc
+
+# A steady-state tick allocates nothing it keeps, which is what this checks.
+# Three allowances remain, each for a cause other than a leak:
+#
+# bytes a tick may allocate and free again: CPython allocates every int
+# above 256, so the tick and step counters cost one each time they count
+TRANSIENT_BUDGET = 64
+# bytes the traced total may differ by between the start and the end of the
+# measured run, however long it is: a float or int held in a pilot's ring
+# buffers is traced if it came from the allocator and not if it came from
+# a freelist, so which kind the slots hold at either end shifts the total
+# by a few objects. A leak grows with the run and soon exceeds this.
+NET_ALLOWANCE = 512
+# files whose allocations are the pilot's map of the world, which grows with
+# the area explored rather than leaking per tick; reported, not budgeted.
+# tracemalloc keeps one frame per allocation by default, the innermost, so
+# a set growing inside CoverageMap counts against coverage.py
+MAP_FILES = ("*/autopilot/coverage.py",)
+
+PILOTS = ("autopilot.autodrive:AutoDrivePilot", "autopilot.autodrive:ContinuousDrivePilot",
+          "autopilot.pest_control:PestControlPilot")
+TICKS = 2000
+WARMUP = 200
+
+OPEN = 500.0
+BLOCKED = 20.0   # within d_threshold, beyond the critical distance
+CRUISE_TICKS = 80
+
+
+class Course:
+    """
+    Lidar readings that take a pilot round cruising, scanning and turning:
+    the way ahead closes after CRUISE_TICKS of cruising, and a scan finds
+    it most open at the far right.
+    """
+
+    def __init__(self, pilot):
+        self.pilot = pilot
+        self.cruised = 0
+        self.sin = SensorInputs(lidar_distance=OPEN, ultrasonic_distance=float('inf'), ultrasonic_age=0.0)
+
+    def sense(self):
+        pilot = self.pilot
+        last = pilot.last_command
+        if pilot.state == pilot.STATE_CRUISING:
+            # modulo keeps the counter among the cached small ints
+            self.cruised = (self.cruised + 1) % CRUISE_TICKS
+            self.sin.lidar_distance = OPEN if self.cruised else BLOCKED
+        elif pilot.state == pilot.STATE_SCANNING and last is not None:
+            self.sin.lidar_distance = 60.0 + last.pan
+        else:
+            self.sin.lidar_distance = OPEN
+        return self.sin
+
+
+def measure(pilot_class, ticks=TICKS, warmup=WARMUP):
+    """
+    Drive a pilot round a Course and trace the memory its ticks allocate.
+
+    Returns:
+        tuple: (bytes of memory gained over the second half of the ticks
+        outside MAP_FILES, bytes the map grew by over it, mean bytes
+        allocated and freed again within a tick)
+    """
+    pilot = pilot_class()
+    clock = VirtualClock()
+    pilot.clock = clock.monotonic
+    pilot.wait = clock.sleep
+    pilot.recorder = FlightRecorder(state_names=pilot.STATE_NAMES)
+    course = Course(pilot)
+    # this file's own objects, such as the totals taken so far, are not the pilot's
+    harness = tracemalloc.Filter(False, __file__)
+    map_only = [harness] + [tracemalloc.Filter(True, pattern) for pattern in MAP_FILES]
+
+    def tick():
+        pilot.sleep()
+        pilot.run_step(course.sense())
+
+    # a file on os.devnull would queue the state change log lines in its
+    # text buffer, which looks like growth until it flushes
+    with contextlib.redirect_stdout(_Discard()):
+        for _ in range(warmup):
+            tick()
+        tracemalloc.start()
+        # objects from before start() are not traced, so replacing them would
+        # look like growth; tick a while with tracing on before measuring
+        for _ in range(warmup):
+            tick()
+        transient = 0
+        ticked = 0
+        memory = []
+        for half in range(2):
+            memory.append(_memory([harness], map_only))
+            done = 0
+            # run each half on until the pilot cruises with nothing queued,
+            # so no maneuver's generators are held when memory is compared
+            while done < ticks // 2 or not _settled(pilot):
+                before = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+                tick()
+                after, peak = tracemalloc.get_traced_memory()
+                # what a tick keeps, such as map cells, counts as growth
+                transient += peak - (after if after > before else before)
+                done += 1
+            ticked += done
+        memory.append(_memory([harness], map_only))
+        tracemalloc.stop()
+    # growth over the second half, the first absorbs freelists filling up
+    (total1, map1), (total2, map2) = memory[1], memory[2]
+    return (total2 - total1) - (map2 - map1), map2 - map1, transient / ticked
+
+
+def check(net, map_growth, transient):
+    """
+    Returns:
+        list: what measure()'s results exceed, empty if nothing
+    """
+    problems = []
+    if abs(net) > NET_ALLOWANCE:
+        problems.append(f"{net} bytes net, allowance {NET_ALLOWANCE}")
+    if transient > TRANSIENT_BUDGET:
+        problems.append(f"{transient:.0f} bytes allocated and freed per tick, budget {TRANSIENT_BUDGET}")
+    return problems
+
+
+def _settled(pilot):
+    return pilot.state == pilot.STATE_CRUISING and pilot.behaviors.active is None \
+        and not pilot.behaviors.pending()
+
+
+class _Discard:
+    def write(self, text):
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+def _memory(pilot_only, map_only):
+    """
+    Traced bytes of the pilot in all, and in MAP_FILES. Both come from one
+    snapshot, so the snapshot's own allocations count in neither.
+    """
+    gc.collect()
+    snapshot = tracemalloc.take_snapshot()
+    return _size(snapshot.filter_traces(pilot_only)), _size(snapshot.filter_traces(map_only))
+
+
+def _size(snapshot):
+    return sum(stat.size for stat in snapshot.statistics("filename"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Trace the memory allocated by steady-state autopilot ticks")
+    parser.add_argument("--pilot", action="append",
+                        help="pilot class as module:Class, constructed without arguments (repeatable)")
+    parser.add_argument("--ticks", type=int, default=TICKS)
+    parser.add_argument("--warmup", type=int, default=WARMUP)
+    args = parser.parse_args()
+
+    failed = False
+    for spec in args.pilot or PILOTS:
+        net, map_growth, transient = measure(load_pilot(spec), args.ticks, args.warmup)
+        print(f"{spec}: {net} bytes net over the second half, {transient:.0f} bytes allocated and "
+              f"freed per tick, map +{map_growth} bytes")
+        for problem in check(net, map_growth, transient):
+            print(f"  over budget: {problem}")
+            failed = True
+    # non-zero exit when ticks leave memory behind or allocate more than
+    # the counters do; tests/test_alloc.py runs the same check
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+from driver.picarx import Picarx
+from driver.sim import SimHat
+import time
+
+TICKS = 200
+
+# Commands as the autopilot emits them: long runs of the same command
+# (cruise, scan sweeps) with occasional changes.
+def commands():
+    for i in range(TICKS):
+        if i < 80:
+            yield 50, -1, 0, -5             # cruising
+        elif i < 140:
+            yield 0, 0, -30 + (i - 80), -10  # pan/tilt scan
+        else:
+            yield 0, 180, 0, 0              # turning
+
+def tick(px, speed, angle, pan, tilt):
+    px.dir_current_angle = angle
+    px.turn(0)
+    px.left_motor_base_power = speed
+    px.right_motor_base_power = speed
+    px.update_motor()
+    px.set_cam_pan_angle(pan)
+    px.set_cam_tilt_angle(tilt)
+
+def run(px, bus, batched):
+    bus.reset()
+    px._shadow = {}
+    start = time.perf_counter()
+    for cmd in commands():
+        if batched:
+            with px.batch():
+                tick(px, *cmd)
+        else:
+            tick(px, *cmd)
+    elapsed = time.perf_counter() - start
+    return bus.count('i2c'), bus.count('gpio'), elapsed
+
+def main():
+    hat = SimHat()
+    px = Picarx(backend=hat)
+    bus = hat.bus
+    for name, batched in (("unbatched", False), ("batched", True)):
+        i2c, gpio, elapsed = run(px, bus, batched)
+        print(f"{name:>10}: {i2c/TICKS:5.2f} i2c + {gpio/TICKS:5.2f} gpio writes/tick, "
+              f"{elapsed/TICKS*1000:6.3f} ms/tick")
+
+if __name__ == "__main__":
+    main()
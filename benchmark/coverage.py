@@ -0,0 +1,86 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+from autopilot.pest_control import PestControlPilot
+from simulation.runner import Simulation
+from simulation.world import World
+import argparse
+import contextlib
+import math
+
+
+class EveryMeterPilot(PestControlPilot):
+    # the pest-control pilot before the coverage planner: survey to the
+    # right after every meter of cruise, wherever the car is
+    def plan(self):
+        if self.coverage.odometer - self.surveyed_at >= 100:
+            self.behaviors.submit("survey", self.surveying(1))
+            return True
+        return False
+
+
+class SurveySimulation(Simulation):
+    """
+    Tracks the cells and flies that were really in the camera's view while
+    the pilot was looking for flies.
+    """
+
+    def __init__(self, pilot, world):
+        super().__init__(pilot, world)
+        self.seen = set()
+        self.found = set()
+
+    def step(self):
+        cmd = super().step()
+        if self.pilot.state == self.pilot.STATE_FLY_DETECTION:
+            v = self.vehicle
+            heading = v.pan_heading()
+            for i, _ in self.world.visible_flies(v.x, v.y, heading, self.CAMERA_FOV, self.CAMERA_RANGE):
+                self.found.add(i)
+            size = self.COVERAGE_CELL
+            reach = PestControlPilot.SURVEY_RANGE
+            for cx in range(int((v.x - reach) // size), int((v.x + reach) // size) + 1):
+                for cy in range(int((v.y - reach) // size), int((v.y + reach) // size) + 1):
+                    x, y = (cx + 0.5) * size, (cy + 0.5) * size
+                    distance = math.hypot(x - v.x, y - v.y)
+                    bearing = (math.atan2(y - v.y, x - v.x) - heading + math.pi) % (2 * math.pi) - math.pi
+                    if (distance <= reach and abs(bearing) <= self.CAMERA_FOV / 2
+                            and self.world.ray(v.x, v.y, heading + bearing, distance) >= distance):
+                        self.seen.add((cx, cy))
+        return cmd
+
+
+def run(pilot_class, seeds, duration, size):
+    totals = {"surveys": 0, "seen": 0.0, "found": 0, "flies": 0, "all_found": 0}
+    for seed in seeds:
+        world = World.random(seed, *size)
+        sim = SurveySimulation(pilot_class(), world)
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            metrics = sim.run(duration)
+        cells = math.ceil(world.width / sim.COVERAGE_CELL) * math.ceil(world.height / sim.COVERAGE_CELL)
+        totals["surveys"] += sim.pilot.surveys
+        totals["seen"] += len(sim.seen) / cells
+        totals["found"] += len(sim.found)
+        totals["flies"] += metrics["flies"]
+        totals["all_found"] += len(sim.found) == metrics["flies"]
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare surveying every meter with the coverage planner in simulation")
+    parser.add_argument("--seeds", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=300, help="simulated seconds per course")
+    parser.add_argument("--size", default="800x600", help="world size in cm")
+    args = parser.parse_args()
+
+    size = tuple(int(v) for v in args.size.split("x"))
+    minutes = args.duration / 60
+    for name, cls in (("every 1 m", EveryMeterPilot), ("planner", PestControlPilot)):
+        r = run(cls, range(args.seeds), args.duration, size)
+        seen = r["seen"] / args.seeds
+        print(f"{name:>9}: {r['surveys']} surveys, {seen:.0%} of the floor surveyed "
+              f"({seen / minutes:.1%} per minute), {r['found']}/{r['flies']} flies in view of a survey, "
+              f"all of them in {r['all_found']}/{args.seeds} courses")
+
+
+if __name__ == "__main__":
+    main()
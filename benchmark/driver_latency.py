@@ -0,0 +1,126 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+from driver.picarx import Picarx
+from benchmark.batch_commit import commands, tick
+import argparse
+import contextlib
+import json
+import time
+
+# name -> fn(px, i); i varies the values so every call reaches the bus
+OPERATIONS = {
+    "set_motor_speed": lambda px, i: px.set_motor_speed(1, 30 + i % 2 * 20),
+    "set_dir_servo_angle": lambda px, i: px.set_dir_servo_angle(-10 + i % 2 * 20),
+    "set_cam_pan_angle": lambda px, i: px.set_cam_pan_angle(-10 + i % 2 * 20),
+    "turn": lambda px, i: px.turn(5 if i % 2 else -5),
+    "update_motor": lambda px, i: update_motor(px, i),
+    "stop": lambda px, i: px.stop(),
+}
+
+def update_motor(px, i):
+    px.left_motor_base_power = px.right_motor_base_power = 30 + i % 2 * 20
+    px.update_motor()
+
+# Per-tick sequences as the autopilot loop drives them
+def tick_unbatched(px, cmd):
+    tick(px, *cmd)
+
+def tick_batched(px, cmd):
+    with px.batch():
+        tick(px, *cmd)
+
+def tick_move_to(px, cmd):
+    px.move_to(*cmd)
+
+SEQUENCES = {
+    "tick_unbatched": tick_unbatched,
+    "tick_batched": tick_batched,
+    "tick_move_to": tick_move_to,
+}
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+def summarize(samples, writes):
+    ordered = sorted(samples)
+    return {
+        "calls": len(ordered),
+        "p50_ms": percentile(ordered, 0.50) * 1000,
+        "p99_ms": percentile(ordered, 0.99) * 1000,
+        "mean_ms": sum(ordered) / len(ordered) * 1000,
+        "writes_per_call": writes / len(ordered),
+    }
+
+def measure(px, fn, args_list):
+    px.reset()
+    px._shadow = {}
+    samples = []
+    writes = px.writes
+    for args in args_list:
+        start = time.perf_counter()
+        fn(px, args)
+        samples.append(time.perf_counter() - start)
+    return summarize(samples, px.writes - writes)
+
+def run(backend, iterations):
+    # keep stdout clean for the JSON report
+    with contextlib.redirect_stdout(sys.stderr):
+        px = Picarx(backend=backend)
+    results = {}
+    for name, fn in OPERATIONS.items():
+        results[name] = measure(px, fn, range(iterations))
+    ticks = list(commands())
+    ticks = (ticks * (iterations // len(ticks) + 1))[:iterations]
+    for name, fn in SEQUENCES.items():
+        results[name] = measure(px, fn, ticks)
+    px.stop()
+    return {
+        "backend": backend,
+        "iterations": iterations,
+        "timestamp": time.time(),
+        "results": results,
+    }
+
+def compare(report, baseline, tolerance):
+    '''
+    Print p99 changes against a baseline report; returns the names that
+    regressed by more than tolerance (a fraction).
+    '''
+    regressions = []
+    for name, result in report["results"].items():
+        base = baseline["results"].get(name)
+        if base is None or base["p99_ms"] == 0:
+            continue
+        change = result["p99_ms"] / base["p99_ms"] - 1
+        flag = ""
+        if change > tolerance:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:>20}: p99 {base['p99_ms']:8.3f} -> {result['p99_ms']:8.3f} ms ({change:+.0%}){flag}",
+              file=sys.stderr)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Actuation latency benchmark for driver/picarx.py")
+    parser.add_argument("--backend", default="sim", help="robot_hat or sim")
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", help="baseline JSON report to compare p99 against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p99 increase, default 0.2")
+    args = parser.parse_args()
+
+    report = run(args.backend, args.iterations)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.tolerance):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+from autopilot.autopilot import Autopilot
+from autopilot.autodrive import AutoDrivePilot
+from autopilot.characterize import CharacterizationPilot
+from simulation.runner import Simulation
+from simulation.vehicle import Vehicle
+from simulation.world import World
+import argparse
+import contextlib
+import math
+
+# a car that is slower than the constants say, turns slower and stalls below power 15
+CAR = {"max_speed": 40, "turn_time": 3.6, "deadband": 15}
+
+
+class ManeuverPilot(Autopilot):
+    # turns by the given angle, or cruises the given distance, then stops
+    def __init__(self, angle=0, meters=0):
+        super().__init__()
+        self.meters = meters
+        if angle:
+            self.behaviors.submit("turn", self.steps(lambda: self.init_turn(angle), self.turn))
+
+    def on_ready(self):
+        return self.cruise() if self.meters else self.stop()
+
+    def on_cruising(self):
+        if self.get_cruise_dist() >= self.meters:
+            return self.stop()
+        return self.cruise()
+
+    def on_turning(self):
+        return self.stop()
+
+    def on_stopped(self):
+        return self.stop()
+
+
+def characterize():
+    pilot = CharacterizationPilot()
+    sim = Simulation(pilot, World.random(0, 600, 600, obstacles=0, flies=0),
+                     Vehicle(300, 50, heading=math.pi / 2, **CAR))
+    while not pilot.done:
+        sim.step()
+    return pilot.table
+
+
+def maneuver(table, angle=0, meters=0):
+    """
+    Returns:
+        tuple: (degrees turned clockwise, meters driven)
+    """
+    pilot = ManeuverPilot(angle, meters)
+    pilot.kinematics_table = table
+    vehicle = Vehicle(300, 300, **CAR)
+    sim = Simulation(pilot, World.random(0, 600, 600, obstacles=0, flies=0), vehicle)
+    sim.run(8)
+    return -math.degrees(vehicle.heading), vehicle.odometer / 100
+
+
+def run(pilot_class, table, seeds, duration):
+    totals = {"distance_m": 0.0, "scans": 0, "collisions": 0}
+    for seed in seeds:
+        pilot = pilot_class()
+        pilot.kinematics_table = table
+        world = World.random(seed, 800, 600)
+        sim = Simulation(pilot, world, Vehicle(world.width / 2, world.height / 2, **CAR))
+        metrics = sim.run(duration)
+        totals["distance_m"] += metrics["distance_m"]
+        totals["scans"] += sum(n for (a, b), n in pilot.transition_counts().items() if b == "SCANNING")
+        totals["collisions"] += metrics["collisions"]
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the TURN_TIME/CRUISE_SPEED constants with "
+                                                 "characterized kinematics tables on a mis-calibrated car")
+    parser.add_argument("--seeds", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=300, help="simulated seconds per course")
+    args = parser.parse_args()
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        table = characterize()
+        results = {}
+        for name, t in (("constants", None), ("tables", table)):
+            turns = [(angle, maneuver(t, angle=angle)[0]) for angle in (15, 30, 45, 90, 135, 180)]
+            driven = maneuver(t, meters=1.0)[1]
+            results[name] = turns, driven, run(AutoDrivePilot, t, range(args.seeds), args.duration)
+
+    for name, (turns, driven, r) in results.items():
+        error = sum(abs(turned - angle) for angle, turned in turns) / len(turns)
+        print(f"{name:>9}: turns off by {error:.1f} degrees on average, "
+              f"1 m cruise drove {driven:.2f} m; autodrive {r['distance_m']:.1f} m, "
+              f"{r['scans']} scans, {r['collisions']} collisions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+from autopilot.autodrive import AutoDrivePilot
+from simulation.runner import Simulation
+from simulation.world import World
+import argparse
+import contextlib
+
+
+class SweepPilot(AutoDrivePilot):
+    SCAN_ADAPTIVE = False
+
+
+def run(pilot_class, seeds, duration):
+    totals = {"scans": 0, "scan_s": 0.0, "distance_m": 0.0, "collisions": 0}
+    for seed in seeds:
+        sim = Simulation(pilot_class(), World.random(seed))
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            metrics = sim.run(duration)
+        totals["scans"] += sum(n for (a, b), n in sim.pilot.transition_counts().items() if b == "SCANNING")
+        totals["scan_s"] += metrics["state_time_s"].get("SCANNING", 0.0)
+        totals["distance_m"] += metrics["distance_m"]
+        totals["collisions"] += metrics["collisions"]
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the full pan sweep with the adaptive scan in simulation")
+    parser.add_argument("--seeds", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=300, help="simulated seconds per course")
+    args = parser.parse_args()
+
+    seeds = range(args.seeds)
+    results = {name: run(cls, seeds, args.duration)
+               for name, cls in (("sweep", SweepPilot), ("adaptive", AutoDrivePilot))}
+    for name, r in results.items():
+        per_scan = r["scan_s"] / r["scans"] if r["scans"] else 0.0
+        print(f"{name:>8}: {r['scans']} scans, {per_scan:.2f} s per scan, {r['scan_s'] / 60:.1f} min scanning, "
+              f"{r['distance_m']:.1f} m driven, {r['collisions']} collisions")
+    sweep, adaptive = results["sweep"], results["adaptive"]
+    if sweep["scans"] and adaptive["scans"]:
+        saved = 1 - (adaptive["scan_s"] / adaptive["scans"]) / (sweep["scan_s"] / sweep["scans"])
+        print(f"Time per scan saved: {saved:.0%}")
+
+
+if __name__ == "__main__":
+    main()
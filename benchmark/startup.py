@@ -0,0 +1,29 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+from driver.picarx import Picarx
+import argparse
+import time
+
+def construct(backend, warm_start):
+    start = time.perf_counter()
+    px = Picarx(backend=backend, warm_start=warm_start)
+    elapsed = time.perf_counter() - start
+    px.stop()
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure Picarx construction time")
+    parser.add_argument("--backend", default="sim", help="robot_hat or sim")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    # the first cold start writes the warm snapshot the later runs use
+    cold = [construct(args.backend, False) for _ in range(args.runs)]
+    warm = [construct(args.backend, True) for _ in range(args.runs)]
+    for name, samples in (("cold", cold), ("warm", warm)):
+        samples.sort()
+        print(f"{name}: median {samples[len(samples)//2]*1000:7.2f} ms, "
+              f"min {samples[0]*1000:7.2f} ms, max {samples[-1]*1000:7.2f} ms")
+
+if __name__ == "__main__":
+    main()
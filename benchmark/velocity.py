@@ -0,0 +1,45 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+from autopilot.autodrive import AutoDrivePilot, ContinuousDrivePilot
+from simulation.runner import Simulation
+from simulation.world import World
+import argparse
+import contextlib
+
+
+def run(pilot_class, base_speed, seeds, duration, size):
+    totals = {"distance_m": 0.0, "cruise_s": 0.0, "scans": 0, "collisions": 0}
+    for seed in seeds:
+        pilot = pilot_class()
+        pilot.base_speed = base_speed
+        sim = Simulation(pilot, World.random(seed, *size))
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            metrics = sim.run(duration)
+        totals["distance_m"] += metrics["distance_m"]
+        totals["cruise_s"] += metrics["state_time_s"].get("CRUISING", 0.0)
+        totals["scans"] += sum(n for (a, b), n in pilot.transition_counts().items() if b == "SCANNING")
+        totals["collisions"] += metrics["collisions"]
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare stop-scan-go with continuous speed control in simulation")
+    parser.add_argument("--seeds", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=300, help="simulated seconds per course")
+    parser.add_argument("--speeds", default="50,90", help="base speeds to try")
+    parser.add_argument("--size", default="800x600", help="world size in cm")
+    args = parser.parse_args()
+
+    size = tuple(int(v) for v in args.size.split("x"))
+    seeds = range(args.seeds)
+    total_time = args.seeds * args.duration
+    for name, cls in (("stop-go", AutoDrivePilot), ("continuous", ContinuousDrivePilot)):
+        for speed in (int(s) for s in args.speeds.split(",")):
+            r = run(cls, speed, seeds, args.duration, size)
+            print(f"{name:>10} @ {speed:3d}: average {r['distance_m'] * 100 / total_time:5.1f} cm/s, "
+                  f"{r['scans']} scans, {r['collisions']} collisions "
+                  f"({r['collisions'] / r['distance_m'] if r['distance_m'] else 0:.2f} per m)")
+
+
+if __name__ == "__main__":
+    main()
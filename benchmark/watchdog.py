@@ -0,0 +1,99 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+from driver.picarx import Picarx
+from driver.actuator import Actuator
+from driver.sim import SimHat
+from driver.watchdog import Watchdog
+from autopilot.autopilot import Command
+import argparse
+import contextlib
+import time
+
+# Stalls a 20 Hz control loop, steering on the simulated bus with motion
+# profiles on, in one of its stages and times how long the motors keep
+# running, with and without the watchdog. With the watchdog every motor
+# write from the cutoff to the end of the stall must be 0: a profile or a
+# steering differential that brings the motors back fails the run.
+
+PERIOD = 0.05
+COMMANDS = {
+    "steering": Command(50, 20, 0, 0),
+    "pivot": Command(0, -30, 0, 0),  # full lock at zero speed spins in place
+}
+STAGES = ("sensors", "decision")
+
+def run(stage, cmd, stall, watchdog_on, deadline):
+    '''
+    Returns:
+        tuple: (seconds into the stall the motors stopped, or None if they
+        ran through it; seconds into the stall of the first nonzero motor
+        write after that, or None; the watchdog's stats)
+    '''
+    hat = SimHat()
+    with contextlib.redirect_stdout(sys.stderr):
+        px = Picarx(backend=hat)
+    px.enable_motion_profiles()
+    watchdog = Watchdog(px, deadline=deadline).start() if watchdog_on else None
+    actuator = Actuator(px, watchdog=watchdog).start()
+
+    stalled_at = resumed_at = None
+    try:
+        for i in range(40):
+            for name in STAGES:
+                if watchdog is not None:
+                    watchdog.feed(name)
+                if i == 20 and name == stage:
+                    hat.bus.transactions.clear()
+                    stalled_at = time.perf_counter()
+                    time.sleep(stall)
+                    resumed_at = time.perf_counter()
+            actuator.submit(cmd)
+            time.sleep(PERIOD)
+        channels = [pin.channel for pin in px.motor_speed_pins]
+        # the last value written to each motor, tracked through the stall
+        speeds = {}
+        cutoff = restarted = None
+        for start, kind, ch, value, _ in hat.bus.transactions:
+            if ch not in channels or start >= resumed_at:
+                continue
+            speeds[ch] = value
+            if cutoff is None:
+                if len(speeds) == len(channels) and not any(speeds.values()):
+                    cutoff = start - stalled_at
+            elif value != 0 and restarted is None:
+                restarted = start - stalled_at
+        misses = watchdog.stats() if watchdog is not None else None
+    finally:
+        if watchdog is not None:
+            watchdog.close()
+        actuator.close()
+    return cutoff, restarted, misses
+
+def main():
+    parser = argparse.ArgumentParser(description="Motor cutoff on a stalled control loop")
+    parser.add_argument("--stall", type=float, default=1.0, help="seconds the stage hangs")
+    parser.add_argument("--deadline", type=float, default=Watchdog.DEADLINE)
+    args = parser.parse_args()
+
+    failed = False
+    for label, cmd in COMMANDS.items():
+        for stage in STAGES:
+            for watchdog_on in (False, True):
+                cutoff, restarted, stats = run(stage, cmd, args.stall, watchdog_on, args.deadline)
+                name = "watchdog" if watchdog_on else "  none  "
+                if cutoff is None:
+                    result = "motors ran through the %.0f ms stall" % (args.stall * 1000)
+                else:
+                    result = "motors stopped %.0f ms into the stall" % (cutoff * 1000)
+                if restarted is not None:
+                    result += ", restarted %.0f ms into it" % (restarted * 1000)
+                if stats is not None:
+                    result += ", misses by stage %s" % stats["stages"]
+                print(f"{label:>8} {stage:>8} stall, {name}: {result}")
+                if watchdog_on:
+                    failed |= cutoff is None or restarted is not None
+    # non-zero exit when the watchdog let the motors run during a stall
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
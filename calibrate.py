@@ -145,7 +145,8 @@ def cali_helper():
                     px.cam_pan_servo_calibrate(servos_offset[1])
                     px.cam_tilt_servo_calibrate(servos_offset[2])
                     px.motor_direction_calibrate(motor_num +1 , motors_offset[motor_num])
-                    sleep(0.2)
+                    # make sure it is on disk before reporting it saved
+                    px.config_file.flush()
                     servos_offset = [px.dir_cali_val, px.cam_pan_cali_val, px.cam_tilt_cali_val]
                     show_info()
                     print('The calibration value has been saved.')
@@ -0,0 +1,179 @@
+import threading
+import time
+from collections import deque
+
+
+class Mailbox(object):
+    '''
+    Single-slot mailbox. put() overwrites whatever has not been taken yet,
+    so the consumer always sees the latest item and never a backlog.
+    '''
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._item = None
+        self._stamp = 0.0
+        self.overwritten = 0
+
+    def put(self, item):
+        with self._lock:
+            if self._item is not None:
+                self.overwritten += 1
+            self._item = item
+            self._stamp = time.perf_counter()
+
+    def take(self):
+        '''
+        Return (item, put_time) and empty the slot; item is None if empty.
+        '''
+        with self._lock:
+            item, stamp = self._item, self._stamp
+            self._item = None
+            return item, stamp
+
+    def clear(self):
+        with self._lock:
+            self._item = None
+
+
+class Actuator(object):
+    '''
+    Owns a Picarx and applies commands to it from a dedicated thread, so
+    control loops never wait on I2C.
+
+    Commands go through a latest-wins Mailbox and are applied at a fixed
+    rate; a command that is superseded before the next apply is dropped.
+    Any object with speed, angle, pan and tilt attributes is accepted and
+    copied on submit, so callers may reuse it. One-off side effects (pump,
+    stop) are queued with call() and run in order before the next command.
+    If the Picarx has motion profiles enabled, commands become profile
+    targets and this thread steps them every cycle. Every submit feeds the
+    optional Watchdog (watchdog.py), so the motors stop when commands do;
+    the profiles are not stepped while it is tripped, so they cannot ramp
+    the motors back up before the next command.
+
+        actuator = Actuator(px).start()
+        while True:
+            actuator.submit(ap.run(sensor_inputs))
+    '''
+    RATE = 50  # Hz
+    STATS_WINDOW = 256
+
+    def __init__(self, px, rate=RATE, profiler=None, watchdog=None):
+        '''
+        param profiler: optional PhaseProfiler (autopilot/profiler.py) that
+                        gets the bus time of every apply as "actuation"
+        param watchdog: optional Watchdog fed by every submitted command
+        '''
+        self.px = px
+        self.profiler = profiler
+        self.watchdog = watchdog
+        self.period = 1.0 / rate
+        self.mailbox = Mailbox()
+        self._calls = deque()
+        self._running = False
+        self._thread = None
+        # submit-to-applied latency and time spent on the bus, in seconds
+        self._latency = deque(maxlen=self.STATS_WINDOW)
+        self._bus_time = deque(maxlen=self.STATS_WINDOW)
+        self.applied = 0
+        self.overruns = 0
+        self.last_applied = None
+
+    def start(self):
+        if self._thread is not None:
+            return self
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name="actuator", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self, timeout=1.0):
+        '''
+        Stop the thread and the motors. Safe to call more than once.
+        '''
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.px.stop()
+
+    def submit(self, command):
+        self.mailbox.put((command.speed, command.angle, command.pan, command.tilt))
+        if self.watchdog is not None:
+            self.watchdog.feed()
+
+    def call(self, fn, *args):
+        '''
+        Run fn(*args) on the actuator thread before the next command.
+        '''
+        self._calls.append((fn, args))
+
+    def halt(self):
+        '''
+        Drop any pending command and stop the motors on the next cycle.
+        '''
+        self.mailbox.clear()
+        self.call(self.px.stop)
+
+    def apply(self, speed, angle, pan, tilt):
+        self.px.move_to(speed, angle, pan, tilt)
+
+    def _cycle(self):
+        while self._calls:
+            fn, args = self._calls.popleft()
+            fn(*args)
+        command, stamp = self.mailbox.take()
+        if command is not None:
+            start = time.perf_counter()
+            self.apply(*command)
+            end = time.perf_counter()
+            self._bus_time.append(end - start)
+            if self.profiler is not None:
+                self.profiler.record("actuation", end - start)
+            self._latency.append(end - stamp)
+            self.applied += 1
+            self.last_applied = command
+        watchdog = self.watchdog
+        if self.px.motion is not None and (watchdog is None or not watchdog.tripped):
+            # this thread doubles as the motion profile stepper; it leaves
+            # the outputs alone while the watchdog has them stopped
+            self.px.step_motion(self.period)
+
+    def _loop(self):
+        deadline = time.monotonic()
+        while self._running:
+            try:
+                self._cycle()
+            except Exception as e:
+                print("[Actuator] apply failed: %s" % e)
+                self.mailbox.clear()
+                self.px.stop()
+            deadline += self.period
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # fell behind; restart the schedule instead of bursting
+                self.overruns += 1
+                deadline = time.monotonic()
+
+    def stats(self):
+        '''
+        Apply latency over the last STATS_WINDOW commands, in milliseconds.
+        '''
+        def summary(samples):
+            if not samples:
+                return {"mean": 0.0, "p99": 0.0, "max": 0.0}
+            ordered = sorted(samples)
+            return {
+                "mean": sum(ordered) / len(ordered) * 1000,
+                "p99": ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000,
+                "max": ordered[-1] * 1000,
+            }
+        return {
+            "applied": self.applied,
+            "dropped": self.mailbox.overwritten,
+            "overruns": self.overruns,
+            "latency_ms": summary(list(self._latency)),
+            "bus_ms": summary(list(self._bus_time)),
+        }
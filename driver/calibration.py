@@ -0,0 +1,165 @@
+import atexit
+import os
+import pwd
+import tempfile
+import threading
+import time
+
+
+class CalibrationStore(object):
+    '''
+    In-memory view of the picar-x config file, a drop-in for robot_hat's
+    fileDB get()/set().
+
+    The file is read once. set() only updates memory and marks the store
+    dirty; a background thread writes the whole file FLUSH_DELAY seconds
+    later, so bursts of calibration changes cost one write and callers on
+    the actuation path never touch the disk. Writes go to a temp file in the
+    same directory which is fsynced and renamed over the config, so a crash
+    leaves either the old or the new file, never a torn one. Pending changes
+    are flushed at interpreter exit.
+    '''
+    FLUSH_DELAY = 0.5
+    HEADER = '# robot-hat config and calibration value of robots\n\n'
+
+    def __init__(self, db, mode=None, owner=None, flush_delay=FLUSH_DELAY):
+        self.db = db
+        self.mode = mode
+        self.owner = owner
+        self.flush_delay = flush_delay
+        self._lock = threading.Lock()
+        # held from render to rename, so an older render never lands last
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._dirty = False
+        self._closed = False
+        self._lines = []
+        self._values = {}
+        self._load()
+        self._thread = threading.Thread(target=self._flusher, name="calibration", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _load(self):
+        try:
+            with open(self.db) as f:
+                self._lines = f.readlines()
+        except OSError:
+            self._lines = [self.HEADER]
+        for line in self._lines:
+            if line.startswith('#') or '=' not in line:
+                continue
+            name, value = line.split('=', 1)
+            self._values[name.strip()] = value.strip()
+
+    def get(self, name, default_value=None):
+        with self._lock:
+            return self._values.get(name, default_value)
+
+    def set(self, name, value):
+        with self._lock:
+            self._values[name] = str(value)
+            self._dirty = True
+        self._wake.set()
+
+    @property
+    def dirty(self):
+        return self._dirty
+
+    def _render(self):
+        '''
+        Rebuild the file contents, keeping comments and key order.
+        '''
+        lines = []
+        written = set()
+        for line in self._lines:
+            if line.startswith('#') or '=' not in line:
+                lines.append(line)
+                continue
+            name = line.split('=', 1)[0].strip()
+            if name in self._values and name not in written:
+                lines.append('%s = %s\n' % (name, self._values[name]))
+                written.add(name)
+        for name, value in self._values.items():
+            if name not in written:
+                lines.append('%s = %s\n' % (name, value))
+        return lines
+
+    def flush(self):
+        '''
+        Write pending changes now. Returns True if the file was written.
+        '''
+        with self._write_lock:
+            with self._lock:
+                if not self._dirty:
+                    return False
+                lines = self._render()
+                self._dirty = False
+            try:
+                self._write(''.join(lines))
+            except OSError as e:
+                with self._lock:
+                    self._dirty = True
+                print("calibration not saved: %s" % e)
+                return False
+            with self._lock:
+                self._lines = lines
+            return True
+
+    def _write(self, content):
+        directory = os.path.dirname(os.path.abspath(self.db))
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix='.picarx-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            self._copy_permissions(tmp)
+            os.replace(tmp, self.db)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        # make the rename itself durable
+        dir_fd = os.open(directory, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+    def _copy_permissions(self, tmp):
+        '''
+        Give the temp file the config's mode and owner, or the mode and
+        owner fileDB would create it with if there is no config yet.
+        '''
+        try:
+            st = os.stat(self.db)
+            mode, uid, gid = st.st_mode, st.st_uid, st.st_gid
+        except OSError:
+            mode = int(str(self.mode), 8) if self.mode is not None else 0o644
+            uid = gid = -1
+            if self.owner is not None:
+                try:
+                    entry = pwd.getpwnam(self.owner)
+                    uid, gid = entry.pw_uid, entry.pw_gid
+                except KeyError:
+                    pass
+        try:
+            os.chmod(tmp, mode)
+            os.chown(tmp, uid, gid)
+        except OSError:
+            pass
+
+    def _flusher(self):
+        while not self._closed:
+            self._wake.wait()
+            self._wake.clear()
+            if self._closed:
+                break
+            # let a burst of set() calls settle into one write
+            time.sleep(self.flush_delay)
+            self.flush()
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        self.flush()
@@ -1,9 +1,15 @@
-from robot_hat import Pin, ADC, PWM, Servo, fileDB
-from robot_hat import Grayscale_Module, Ultrasonic, utils
-from picamera2 import Picamera2
+from contextlib import contextmanager
+import getpass
+import json
+import tempfile
+import threading
 import time
 import os
 
+from driver.calibration import CalibrationStore
+
+BACKEND_ENV = 'PICARX_BACKEND'
+
 
 def constrain(x, min_val, max_val):
     '''
@@ -11,6 +17,134 @@ def constrain(x, min_val, max_val):
     '''
     return max(min_val, min(max_val, x))
 
+def load_backend(backend=None):
+    '''
+    Resolve the hardware backend for Picarx.
+
+    param backend: 'robot_hat', 'sim', or an object exposing the robot_hat
+                   names (Pin, ADC, PWM, Servo, fileDB, Grayscale_Module,
+                   Ultrasonic, utils). Defaults to $PICARX_BACKEND, then
+                   'robot_hat'.
+    '''
+    if backend is None:
+        backend = os.environ.get(BACKEND_ENV, 'robot_hat')
+    if not isinstance(backend, str):
+        return backend
+    if backend == 'robot_hat':
+        import robot_hat
+        return robot_hat
+    if backend == 'sim':
+        from driver.sim import SimHat
+        return SimHat()
+    raise ValueError("unknown Picarx backend: %s" % backend)
+
+def _parse_list(value):
+    '''
+    Parse a list stored by fileDB, e.g. "[1, -1]", into its items as strings.
+    '''
+    return [i.strip() for i in str(value).strip().strip('[]').split(',')]
+
+def _boot_id():
+    try:
+        with open('/proc/sys/kernel/random/boot_id') as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+def _config_owner():
+    try:
+        return os.getlogin()
+    except OSError:
+        # no controlling terminal (systemd, containers, CI)
+        return getpass.getuser()
+
+class MotionProfile(object):
+    '''
+    Rate-limited setpoint: value moves toward target by at most rate units
+    per second on each step().
+
+    decel, if given, limits moves toward 0 instead, including the part of
+    a sign reversal down to 0; None there drops the value at once. A motor
+    profile uses it so that slowing down and stopping are never ramped.
+    '''
+    RATE = object()  # decel default: the same limit both ways
+
+    def __init__(self, rate, value=0, decel=RATE):
+        self.rate = rate
+        self.decel = decel
+        self.value = value
+        self.target = value
+
+    def step(self, dt):
+        value, target = self.value, self.target
+        if self.decel is not self.RATE and value != 0 and (target * value <= 0 or abs(target) < abs(value)):
+            # slowing down, or reversing through 0: head for 0 (or the
+            # smaller target) at decel, and ramp up from there next step
+            floor = target if target * value > 0 else 0
+            if self.decel is None or abs(floor - value) <= self.decel * dt:
+                self.value = floor
+            else:
+                self.value += self.decel * dt if floor > value else -self.decel * dt
+            return self.value
+        max_delta = self.rate * dt
+        delta = constrain(target - value, -max_delta, max_delta)
+        self.value += delta
+        return self.value
+
+    def reset(self, value):
+        self.value = value
+        self.target = value
+
+    @property
+    def settled(self):
+        return self.value == self.target
+
+
+class MotionStepper(object):
+    '''
+    Background thread that advances the motion profiles of a Picarx.
+    Use it when nothing else is driving step_motion(); Actuator already
+    steps the profiles on its own thread.
+    '''
+    RATE = 50  # Hz
+
+    def __init__(self, px, rate=RATE):
+        self.px = px
+        self.period = 1.0 / rate
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._running = True
+            self._thread = threading.Thread(target=self._loop, name="motion", daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self, timeout=1.0):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _loop(self):
+        deadline = time.monotonic()
+        while self._running:
+            self.px.step_motion(self.period)
+            deadline += self.period
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                deadline = time.monotonic()
+
+
 class Picarx(object):
     CONFIG = '/opt/picar-x/picar-x.conf'
 
@@ -24,15 +158,37 @@ class Picarx(object):
     CAM_TILT_MIN = -35
     CAM_TILT_MAX = 65
 
+    # motion profile limits
+    MOTOR_ACCEL = 200   # % power per second, speeding up
+    MOTOR_DECEL = None  # % power per second, slowing down; None for at once
+    SERVO_SPEED = 240   # degrees per second
+
     PERIOD = 4095
     PRESCALER = 10
     TIMEOUT = 0.02
 
+    # config keys read at startup and their defaults
+    CALIBRATION_DEFAULTS = {
+        "picarx_dir_servo": "0",
+        "picarx_cam_pan_servo": "0",
+        "picarx_cam_tilt_servo": "0",
+        "picarx_dir_motor": "[1, 1]",
+        "line_reference": str(DEFAULT_LINE_REF),
+        "cliff_reference": str(DEFAULT_CLIFF_REF),
+    }
+    # written after every cold start; lives on tmpfs so it dies with a reboot
+    WARM_CACHE = os.path.join('/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(),
+                              'picarx-warm.json')
+
     # servo_pins: camera_pan_servo, camera_tilt_servo, direction_servo
     # motor_pins: left_swicth, right_swicth, left_pwm, right_pwm
     # grayscale_pins: 3 adc channels
     # ultrasonic_pins: trig, echo2
     # config: path of config file
+    # backend: 'robot_hat', 'sim' or a backend object, see load_backend()
+    # warm_start: skip the MCU reset and reuse the cached calibration when
+    #             the MCU was already initialized since boot and still
+    #             answers with the same firmware version
     def __init__(self, 
                 servo_pins:list=['P0', 'P1', 'P2'], 
                 motor_pins:list=['D4', 'D5', 'P13', 'P12'],
@@ -40,32 +196,71 @@ class Picarx(object):
                 ultrasonic_pins:list=['D2','D3'],
                 pump_pin:str='P3',
                 config:str=CONFIG,
+                backend=None,
+                warm_start:bool=False,
                 ):
 
-        # reset robot_hat
-        utils.reset_mcu()
-        time.sleep(0.2)
+        self.hal = hal = load_backend(backend)
+        Pin, PWM, Servo = hal.Pin, hal.PWM, hal.Servo
+        self._config = config
+        self._grayscale_pins = grayscale_pins
+        self._ultrasonic_pins = ultrasonic_pins
+        self._pump_pin = pump_pin
+
+        # reset robot_hat, unless warm starting on an MCU that is already up
+        snapshot = self._load_warm_snapshot() if warm_start else None
+        self.warm_started = snapshot is not None
+        if not self.warm_started:
+            hal.utils.reset_mcu()
+            time.sleep(0.2)
+
+        # --------- batched writes ---------
+        # last value committed to each (channel, method); lets a batch skip
+        # channels whose value did not change since the previous commit
+        self._shadow = {}
+        # writes collected by an open batch(), per thread
+        self._batch_state = threading.local()
+        # serializes bus access between the actuator and sensor threads
+        self._bus_lock = threading.RLock()
+        # bumped by stop(); a batch opened before a stop drops its motor writes
+        self._stops = 0
+        # set by a safety reflex: positive (forward) drive power is cut to 0
+        self.forward_inhibited = False
+        # channel writes actually sent to the hardware
+        self.writes = 0
 
 
         # --------- config_flie ---------
-        self.config_file = fileDB(config, 777, os.getlogin())
+        # opened on first use; calibration comes from the warm snapshot or
+        # is read once from the file below
+        self._config_file = None
+        if snapshot is not None:
+            cali = snapshot
+        else:
+            cali = {key: self.config_file.get(key, default_value=default)
+                    for key, default in self.CALIBRATION_DEFAULTS.items()}
+
+        # -------- Pump, grayscale, ultrasonic: created on first use ------
+        self._pump = None
+        self._grayscale = None
+        self._ultrasonic = None
+        if self.warm_started:
+            # no reset, so the pump may still run from the last session
+            self.deactivate_pump()
 
-        # -------- Pump -------------------
-        self.pump = PWM(pump_pin)
-        self.pump.pulse_width_percent(0)
         # --------- servos init ---------
         self.cam_pan = Servo(servo_pins[0])
         self.cam_tilt = Servo(servo_pins[1])   
         self.dir_servo_pin = Servo(servo_pins[2])
         # get calibration values
-        self.dir_cali_val = float(self.config_file.get("picarx_dir_servo", default_value=0))
-        self.cam_pan_cali_val = float(self.config_file.get("picarx_cam_pan_servo", default_value=0))
-        self.cam_tilt_cali_val = float(self.config_file.get("picarx_cam_tilt_servo", default_value=0))
+        self.dir_cali_val = float(cali["picarx_dir_servo"])
+        self.cam_pan_cali_val = float(cali["picarx_cam_pan_servo"])
+        self.cam_tilt_cali_val = float(cali["picarx_cam_tilt_servo"])
         print("cali values:", self.dir_cali_val, self.cam_pan_cali_val, self.cam_tilt_cali_val)
         # set servos to init angle
-        self.dir_servo_pin.angle(self.dir_cali_val)
-        self.cam_pan.angle(self.cam_pan_cali_val)
-        self.cam_tilt.angle(self.cam_tilt_cali_val)
+        self._write(self.dir_servo_pin, 'angle', self.dir_cali_val)
+        self._write(self.cam_pan, 'angle', self.cam_pan_cali_val)
+        self._write(self.cam_tilt, 'angle', self.cam_tilt_cali_val)
 
         # --------- motors init ---------
         self.left_rear_dir_pin = Pin(motor_pins[0])
@@ -75,30 +270,25 @@ class Picarx(object):
         self.motor_direction_pins = [self.left_rear_dir_pin, self.right_rear_dir_pin]
         self.motor_speed_pins = [self.left_rear_pwm_pin, self.right_rear_pwm_pin]
         # get calibration values
-        self.cali_dir_value = self.config_file.get("picarx_dir_motor", default_value="[1, 1]")
-        self.cali_dir_value = [int(i.strip()) for i in self.cali_dir_value.strip().strip("[]").split(",")]
+        self.cali_dir_value = [int(i) for i in _parse_list(cali["picarx_dir_motor"])]
         self.cali_speed_value = [0, 0]
         self.dir_current_angle = 0
-        # init pwm
+        # init pwm; also on a warm start, as the HAT may have been reset or
+        # power-cycled while the Pi stayed up, and these are write-only
         for pin in self.motor_speed_pins:
             pin.period(self.PERIOD)
             pin.prescaler(self.PRESCALER)
+        if self.warm_started:
+            for pin in self.motor_speed_pins:
+                self._write(pin, 'pulse_width_percent', 0)
+
+        # --------- grayscale references ---------
+        self.line_reference = [float(i) for i in _parse_list(cali["line_reference"])]
+        self.cliff_reference = [float(i) for i in _parse_list(cali["cliff_reference"])]
+
+        if not self.warm_started:
+            self._save_warm_snapshot(cali)
 
-        # --------- grayscale module init ---------
-        adc0, adc1, adc2 = [ADC(pin) for pin in grayscale_pins]
-        self.grayscale = Grayscale_Module(adc0, adc1, adc2, reference=None)
-        # get reference
-        self.line_reference = self.config_file.get("line_reference", default_value=str(self.DEFAULT_LINE_REF))
-        self.line_reference = [float(i) for i in self.line_reference.strip().strip('[]').split(',')]
-        self.cliff_reference = self.config_file.get("cliff_reference", default_value=str(self.DEFAULT_CLIFF_REF))
-        self.cliff_reference = [float(i) for i in self.cliff_reference.strip().strip('[]').split(',')]
-        # transfer reference
-        self.grayscale.reference(self.line_reference)
-
-        # --------- ultrasonic init ---------
-        trig, echo= ultrasonic_pins
-        self.ultrasonic = Ultrasonic(Pin(trig), Pin(echo, mode=Pin.IN, pull=Pin.PULL_DOWN))
-        
         # --------- Camera ------------------
         self.fps = 60
         self.camera_width = 640
@@ -112,15 +302,253 @@ class Picarx(object):
         self.right_motor_differential_power = 0
         self.pan_angle=0
         self.tilt_angle=0
+        # rate-limited setpoints, see enable_motion_profiles()
+        self.motion = None
+        # set by stop(): step_motion() keeps the motors at 0 until move_to()
+        self.motors_held = False
+
+    @property
+    def config_file(self):
+        if self._config_file is None:
+            store = getattr(self.hal, 'CalibrationStore', CalibrationStore)
+            self._config_file = store(self._config, 777, _config_owner())
+        return self._config_file
+
+    @property
+    def pump(self):
+        if self._pump is None:
+            self._pump = self.hal.PWM(self._pump_pin)
+        return self._pump
+
+    @property
+    def grayscale(self):
+        if self._grayscale is None:
+            adc0, adc1, adc2 = [self.hal.ADC(pin) for pin in self._grayscale_pins]
+            self._grayscale = self.hal.Grayscale_Module(adc0, adc1, adc2, reference=None)
+            self._grayscale.reference(self.line_reference)
+        return self._grayscale
+
+    @property
+    def ultrasonic(self):
+        if self._ultrasonic is None:
+            Pin = self.hal.Pin
+            trig, echo = self._ultrasonic_pins
+            self._ultrasonic = self.hal.Ultrasonic(Pin(trig), Pin(echo, mode=Pin.IN, pull=Pin.PULL_DOWN))
+        return self._ultrasonic
+
+    def _backend_name(self):
+        return getattr(self.hal, '__name__', type(self.hal).__name__)
+
+    def _load_warm_snapshot(self):
+        '''
+        Return the calibration cached by the last cold start, or None if the
+        MCU has not been initialized since boot or the config changed.
+        '''
+        try:
+            with open(self.WARM_CACHE) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if snapshot.get("boot_id") != _boot_id() or snapshot.get("config") != self._config:
+            return None
+        if snapshot.get("backend") != self._backend_name():
+            return None
+        if snapshot.get("config_mtime") != _mtime(self._config):
+            return None
+        # the first read from the HAT: a HAT that does not answer, or was
+        # swapped or reflashed since the snapshot, gets a cold start
+        firmware = self._firmware_version()
+        if firmware is None or snapshot.get("firmware") != firmware:
+            return None
+        cali = snapshot.get("calibration", {})
+        if not all(key in cali for key in self.CALIBRATION_DEFAULTS):
+            return None
+        return cali
+
+    def _firmware_version(self):
+        '''
+        The HAT's firmware version as a list, or None if it does not answer.
+        '''
+        try:
+            return [int(i) for i in self.hal.utils.get_firmware_version()]
+        except Exception:
+            return None
+
+    def _save_warm_snapshot(self, cali):
+        snapshot = {
+            "boot_id": _boot_id(),
+            "backend": self._backend_name(),
+            "config": self._config,
+            "config_mtime": _mtime(self._config),
+            "firmware": self._firmware_version(),
+            "calibration": {key: str(value) for key, value in cali.items()},
+        }
+        try:
+            with open(self.WARM_CACHE, 'w') as f:
+                json.dump(snapshot, f)
+        except OSError as e:
+            print("warm start cache not written: %s" % e)
+
+    @property
+    def _pending(self):
+        return getattr(self._batch_state, 'pending', None)
+
+    @_pending.setter
+    def _pending(self, pending):
+        self._batch_state.pending = pending
+
+    def _write(self, device, method, value):
+        '''
+        Write a value to a robot_hat channel, or queue it while a batch is open.
 
-        
+        param device: Pin, PWM or Servo instance
+        param method: name of the setter, e.g. 'value', 'pulse_width_percent', 'angle'
+        param value: value passed to the setter
+        '''
+        key = (id(device), method)
+        pending = self._pending
+        if pending is not None:
+            pending[key] = (device, method, value)
+            return
+        with self._bus_lock:
+            getattr(device, method)(value)
+            self._shadow[key] = value
+            self.writes += 1
+
+    def _commit(self, pending, stops=None):
+        '''
+        Flush queued writes, one bus transaction per channel that changed.
+
+        param stops: stop() count the writes were computed against; if a
+                     stop came since, the motor writes are dropped
+        '''
+        with self._bus_lock:
+            if stops is not None and self._stops != stops:
+                # stopped from another thread meanwhile; the stop wins
+                self._drop_motor_writes(pending)
+            for key, (device, method, value) in pending.items():
+                if self._shadow.get(key) == value:
+                    continue
+                getattr(device, method)(value)
+                self._shadow[key] = value
+                self.writes += 1
+
+    @contextmanager
+    def batch(self, stops=None):
+        '''
+        Collect every channel change made inside the block and commit them
+        together on exit.
+
+        The Robot HAT MCU exposes one register per PWM channel, so a single
+        I2C write per channel is the floor. A batch gets there by keeping only
+        the last value written to each channel and skipping channels whose
+        value is unchanged since the previous commit. Nested batches join the
+        outer one.
+
+            with px.batch():
+                px.turn(0)
+                px.update_motor()
+                px.set_cam_pan_angle(pan)
+
+        A stop() from another thread while the batch is open drops its
+        motor writes. param stops: the stop() count to check against, if
+        the values were computed before the batch opened; a nested batch
+        uses the outer one's.
+        '''
+        if self._pending is not None:
+            yield self
+            return
+        self._pending = {}
+        if stops is None:
+            with self._bus_lock:
+                stops = self._stops
+        try:
+            yield self
+        finally:
+            pending, self._pending = self._pending, None
+            self._commit(pending, stops)
+
+    def _drop_motor_writes(self, pending):
+        for pin in self.motor_speed_pins:
+            pending.pop((id(pin), 'pulse_width_percent'), None)
+
+    def enable_motion_profiles(self, motor_accel=MOTOR_ACCEL, servo_speed=SERVO_SPEED, motor_decel=MOTOR_DECEL):
+        '''
+        Route move_to() through rate-limited profiles: motor power ramps up
+        at most motor_accel %/s and servos turn at most servo_speed deg/s.
+        Power drops at motor_decel %/s, by default at once, so stop, scan
+        and turn commands cut the drive as they do without profiles.
+        Something has to call step_motion() periodically, either an
+        Actuator or a MotionStepper.
+        '''
+        self.motion = {
+            'speed': MotionProfile(motor_accel, self.left_motor_base_power, decel=motor_decel),
+            'angle': MotionProfile(servo_speed, self.dir_current_angle),
+            'pan': MotionProfile(servo_speed, self.pan_angle),
+            'tilt': MotionProfile(servo_speed, self.tilt_angle),
+        }
+
+    def move_to(self, speed=None, angle=None, pan=None, tilt=None):
+        '''
+        Set new targets for drive power, steering and camera angles. Without
+        motion profiles the outputs jump straight to the targets.
+        '''
+        if angle is not None:
+            angle = constrain(angle, self.DIR_MIN, self.DIR_MAX)
+        self.motors_held = False
+        if self.motion is None:
+            self._apply_outputs(
+                self.left_motor_base_power if speed is None else speed,
+                self.dir_current_angle if angle is None else angle,
+                self.pan_angle if pan is None else pan,
+                self.tilt_angle if tilt is None else tilt)
+            return
+        for name, target in (('speed', speed), ('angle', angle), ('pan', pan), ('tilt', tilt)):
+            if target is not None:
+                self.motion[name].target = target
+
+    def step_motion(self, dt):
+        '''
+        Advance every profile by dt seconds and write the result.
+        Returns True once all outputs have reached their targets.
+
+        After stop() the motors stay at 0, differential included, until
+        the next move_to(); steering and camera keep moving.
+        '''
+        m = self.motion
+        if m is None:
+            return True
+        with self._bus_lock:
+            # before the profiles are read: a stop() from here on shows at
+            # commit, which then drops the stale motor writes
+            stops, held = self._stops, self.motors_held
+        for profile in m.values():
+            profile.step(dt)
+        self._apply_outputs(m['speed'].value, m['angle'].value, m['pan'].value, m['tilt'].value,
+                            motors=not held, stops=stops)
+        return all(profile.settled for profile in m.values())
+
+    def _apply_outputs(self, speed, angle, pan, tilt, motors=True, stops=None):
+        with self.batch(stops):
+            if motors:
+                self.dir_current_angle = angle
+                self.turn(0)
+                self.left_motor_base_power = speed
+                self.right_motor_base_power = speed
+                self.update_motor()
+            else:
+                self.set_dir_servo_angle(angle)
+            self.pan_angle = pan
+            self.tilt_angle = tilt
+            self.set_cam_pan_angle(pan)
+            self.set_cam_tilt_angle(tilt)
 
     def activate_pump(self, speed=100):
         speed = constrain(speed, 0, 100)
-        self.pump.pulse_width_percent(speed)
+        self._write(self.pump, 'pulse_width_percent', speed)
     
     def deactivate_pump(self):
-        self.pump.pulse_width_percent(0)
+        self._write(self.pump, 'pulse_width_percent', 0)
 
     def set_motor_speed(self, motor, speed):
         ''' set motor speed
@@ -142,11 +570,11 @@ class Picarx(object):
             speed = int(speed /2 ) + 50
         speed = speed - self.cali_speed_value[motor]
         if direction < 0:
-            self.motor_direction_pins[motor].high()
-            self.motor_speed_pins[motor].pulse_width_percent(speed)
+            self._write(self.motor_direction_pins[motor], 'value', 1)
+            self._write(self.motor_speed_pins[motor], 'pulse_width_percent', speed)
         else:
-            self.motor_direction_pins[motor].low()
-            self.motor_speed_pins[motor].pulse_width_percent(speed)
+            self._write(self.motor_direction_pins[motor], 'value', 0)
+            self._write(self.motor_speed_pins[motor], 'pulse_width_percent', speed)
 
     def motor_speed_calibration(self, value):
         self.cali_speed_value = value
@@ -175,30 +603,30 @@ class Picarx(object):
     def dir_servo_calibrate(self, value):
         self.dir_cali_val = value
         self.config_file.set("picarx_dir_servo", "%s"%value)
-        self.dir_servo_pin.angle(value)
+        self._write(self.dir_servo_pin, 'angle', value)
 
     def set_dir_servo_angle(self, value):
         self.dir_current_angle = constrain(value, self.DIR_MIN, self.DIR_MAX)
         angle_value  = self.dir_current_angle + self.dir_cali_val
-        self.dir_servo_pin.angle(angle_value)
+        self._write(self.dir_servo_pin, 'angle', angle_value)
 
     def cam_pan_servo_calibrate(self, value):
         self.cam_pan_cali_val = value
         self.config_file.set("picarx_cam_pan_servo", "%s"%value)
-        self.cam_pan.angle(value)
+        self._write(self.cam_pan, 'angle', value)
 
     def cam_tilt_servo_calibrate(self, value):
         self.cam_tilt_cali_val = value
         self.config_file.set("picarx_cam_tilt_servo", "%s"%value)
-        self.cam_tilt.angle(value)
+        self._write(self.cam_tilt, 'angle', value)
 
     def set_cam_pan_angle(self, value):
         value = constrain(value, self.CAM_PAN_MIN, self.CAM_PAN_MAX)
-        self.cam_pan.angle(-1*(value + -1*self.cam_pan_cali_val))
+        self._write(self.cam_pan, 'angle', -1*(value + -1*self.cam_pan_cali_val))
 
     def set_cam_tilt_angle(self,value):
         value = constrain(value, self.CAM_TILT_MIN, self.CAM_TILT_MAX)
-        self.cam_tilt.angle(-1*(value + -1*self.cam_tilt_cali_val))
+        self._write(self.cam_tilt, 'angle', -1*(value + -1*self.cam_tilt_cali_val))
 
     def set_power(self, speed):
         self.set_motor_speed(1, speed)
@@ -207,6 +635,9 @@ class Picarx(object):
     def update_motor(self):
         left_power = self.left_motor_base_power - self.left_motor_differential_power
         right_power = self.right_motor_base_power - self.right_motor_differential_power
+        if self.forward_inhibited:
+            # after mixing, so the steering differential cannot drive a wheel forward
+            left_power, right_power = min(0, left_power), min(0, right_power)
         right_power =  -1*right_power
         self.set_motor_speed(1, left_power)
         self.set_motor_speed(2, right_power)
@@ -294,15 +725,30 @@ class Picarx(object):
     def stop(self):
         '''
         Execute twice to make sure it stops
+
+        Stopping is never deferred: inside a batch the motor writes go out
+        immediately and any queued motor speed is dropped. With motion
+        profiles the motors stay stopped until the next move_to().
         '''
-        self.left_motor_base_power = 0
-        self.right_motor_base_power = 0
-        self.left_motor_differential_power = 0
-        self.right_motor_base_power = 0
+        with self._bus_lock:
+            # together, so a batch committing under the lock either goes out
+            # before this stop or sees it and drops its motor writes
+            self.left_motor_base_power = 0
+            self.right_motor_base_power = 0
+            self.left_motor_differential_power = 0
+            self.right_motor_differential_power = 0
+            self.motors_held = True
+            if self.motion is not None:
+                self.motion['speed'].reset(0)
+            self._stops += 1
+        pending, self._pending = self._pending, None
+        if pending is not None:
+            self._drop_motor_writes(pending)
         for _ in range(2):
-            self.motor_speed_pins[0].pulse_width_percent(0)
-            self.motor_speed_pins[1].pulse_width_percent(0)
+            self._write(self.motor_speed_pins[0], 'pulse_width_percent', 0)
+            self._write(self.motor_speed_pins[1], 'pulse_width_percent', 0)
             time.sleep(0.002)
+        self._pending = pending
 
     def get_distance(self):
         return self.ultrasonic.read()
@@ -316,7 +762,8 @@ class Picarx(object):
             raise ValueError("grayscale reference must be a 1*3 list")
 
     def get_grayscale_data(self):
-        return list.copy(self.grayscale.read())
+        with self._bus_lock:
+            return list.copy(self.grayscale.read())
 
     def get_line_status(self,gm_val_list):
         return self.grayscale.read_status(gm_val_list)
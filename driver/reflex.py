@@ -0,0 +1,162 @@
+import threading
+import time
+
+
+class SafetyReflex(object):
+    '''
+    High-rate safety loop that sits under the autopilot.
+
+    A dedicated thread checks the latest lidar range at RATE Hz, and with
+    check_cliff samples the grayscale (cliff) ADCs too. When the lidar
+    distance drops below critical_distance, a cliff is seen, or the lidar
+    goes silent for longer than stale_timeout, it latches
+    px.forward_inhibited, stops the motors itself and sets event. Reverse
+    stays allowed, and a turn in place pivots on the reversing wheel, so
+    the autopilot can back away. The latch and the event clear once the
+    hazard is gone by clear_margin.
+
+    The lidar is read on a second thread, because a read can block for up
+    to a second while the serial port resyncs. A blocked read therefore
+    never delays the cliff check, and it trips stale_timeout on schedule.
+    Worst-case reaction time is one sample period after a frame arrives,
+    or after the cliff is sampled, independent of the autopilot tick and
+    network load.
+
+    The reflex owns the lidar; read the latest range through lidar_distance
+    instead of calling the lidar from another thread.
+
+        reflex = SafetyReflex(px, lidar.read).start()
+        ap.attach_reflex(reflex.event)
+
+    The cliff check is off by default: the newer car has no grayscale
+    module, and floating ADC inputs would read as a cliff and latch the
+    inhibit. Pass check_cliff=True on a car that has one.
+    '''
+    RATE = 200                # Hz
+    CRITICAL_DISTANCE = 15    # cm
+    CLEAR_MARGIN = 5          # cm above critical_distance to release
+    STALE_TIMEOUT = 0.25      # seconds without a lidar frame
+
+    def __init__(self, px, read_lidar=None, rate=RATE, critical_distance=CRITICAL_DISTANCE,
+                 clear_margin=CLEAR_MARGIN, stale_timeout=STALE_TIMEOUT, check_cliff=False):
+        '''
+        param read_lidar: callable returning (distance, strength, temp) or None,
+                          e.g. sensors.lidar.read. None disables the lidar check.
+        param stale_timeout: seconds without a lidar frame before stopping,
+                             None to ignore a silent lidar
+        param check_cliff: also sample the grayscale module for cliffs; only
+                           on a car fitted with one
+        '''
+        self.px = px
+        self.read_lidar = read_lidar
+        self.period = 1.0 / rate
+        self.critical_distance = critical_distance
+        self.clear_margin = clear_margin
+        self.stale_timeout = stale_timeout
+        self.check_cliff = check_cliff
+        self.event = threading.Event()
+        self.reason = None
+        self.lidar_distance = float('inf')
+        self.lidar_time = 0.0
+        self.trips = 0
+        self.last_latency = None   # sample to motors stopped, seconds
+        self.max_latency = 0.0
+        self.lidar_error = None
+        self._running = False
+        self._thread = None
+        self._lidar_thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._running = True
+            self.lidar_time = time.monotonic()
+            if self.read_lidar is not None:
+                self._lidar_thread = threading.Thread(target=self._lidar_loop, name="reflex-lidar", daemon=True)
+                self._lidar_thread.start()
+            self._thread = threading.Thread(target=self._loop, name="reflex", daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self, timeout=1.0):
+        self._running = False
+        for thread in (self._thread, self._lidar_thread):
+            if thread is not None:
+                thread.join(timeout)
+        self._thread = None
+        self._lidar_thread = None
+
+    def lidar_age(self):
+        return time.monotonic() - self.lidar_time
+
+    def _hazard(self, now):
+        '''
+        Check the latest lidar range, sample the cliff sensors and return
+        the reason to stop, or None.
+        '''
+        if self.read_lidar is not None:
+            limit = self.critical_distance
+            if self.reason is not None:
+                limit += self.clear_margin
+            if self.lidar_distance < limit:
+                return "obstacle"
+            if self.stale_timeout is not None and now - self.lidar_time > self.stale_timeout:
+                return "lidar_stale"
+        if self.check_cliff and self.px.get_cliff_status(self.px.get_grayscale_data()):
+            return "cliff"
+        return None
+
+    def _trip(self, reason, sampled):
+        self.px.forward_inhibited = True
+        self.px.stop()
+        latency = time.monotonic() - sampled
+        self.last_latency = latency
+        self.max_latency = max(self.max_latency, latency)
+        self.trips += 1
+        self.reason = reason
+        self.event.set()
+        print("[Reflex] %s: stopped in %.1f ms (lidar %s cm)" % (reason, latency * 1000, self.lidar_distance))
+
+    def _release(self):
+        self.reason = None
+        self.px.forward_inhibited = False
+        self.event.clear()
+
+    def _lidar_loop(self):
+        '''
+        Publish every lidar frame as it arrives; the reflex loop only reads
+        lidar_distance and lidar_time.
+        '''
+        while self._running:
+            try:
+                frame = self.read_lidar()
+            except Exception as e:
+                if self.lidar_error is None:
+                    print("[Reflex] lidar read failed: %s" % e)
+                self.lidar_error = e
+                frame = None
+            if frame:
+                self.lidar_error = None
+                self.lidar_distance = frame[0]
+                self.lidar_time = time.monotonic()
+            else:
+                # no frame; don't spin on a read that fails at once
+                time.sleep(self.period)
+
+    def _loop(self):
+        deadline = time.monotonic()
+        while self._running:
+            now = time.monotonic()
+            try:
+                reason = self._hazard(now)
+            except Exception as e:
+                reason = "sensor_error: %s" % e
+            if reason is not None and self.reason is None:
+                self._trip(reason, now)
+            elif reason is None and self.reason is not None:
+                self._release()
+            deadline += self.period
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                deadline = time.monotonic()
@@ -0,0 +1,298 @@
+import time
+
+from driver.calibration import CalibrationStore
+
+
+class SimBus(object):
+    '''
+    Stand-in for the Robot HAT buses. Every access is recorded as a
+    transaction (timestamp, kind, channel, value, duration) and costs a
+    modelled latency, so control code can be timed off the car.
+
+    kind is 'i2c' for PWM/servo/ADC registers on the MCU, 'gpio' for pins
+    the Pi drives directly and 'file' for config file rewrites. Reads are
+    recorded with value ('read', result).
+    '''
+    I2C_LATENCY = 0.0005    # ~4 bytes at 100 kHz plus smbus overhead
+    GPIO_LATENCY = 0.00002
+    FILE_LATENCY = 0.005    # fileDB rewrites the whole config file
+
+    def __init__(self, i2c_latency=I2C_LATENCY, gpio_latency=GPIO_LATENCY, file_latency=FILE_LATENCY):
+        self.latency = {'i2c': i2c_latency, 'gpio': gpio_latency, 'file': file_latency}
+        self.transactions = []
+
+    def write(self, kind, channel, value):
+        start = time.perf_counter()
+        delay = self.latency[kind]
+        if delay:
+            # busy-wait: time.sleep() can't resolve sub-millisecond delays
+            while time.perf_counter() - start < delay:
+                pass
+        self.transactions.append((start, kind, channel, value, time.perf_counter() - start))
+
+    def read(self, kind, channel, value):
+        self.write(kind, channel, ('read', value))
+        return value
+
+    def count(self, kind=None):
+        if kind is None:
+            return len(self.transactions)
+        return sum(1 for t in self.transactions if t[1] == kind)
+
+    def busy_time(self):
+        return sum(t[4] for t in self.transactions)
+
+    def reset(self):
+        self.transactions = []
+
+
+class SimPin(object):
+    '''
+    GPIO pin that records writes on a SimBus.
+    '''
+    OUT = 0x01
+    IN = 0x02
+    PULL_UP = 0x11
+    PULL_DOWN = 0x12
+    PULL_NONE = None
+
+    bus = None
+
+    def __init__(self, pin, mode=None, pull=None, active_state=None):
+        self.name = pin
+        self._mode = mode
+        self._value = 0
+
+    def value(self, value=None):
+        if value is None:
+            return self.bus.read('gpio', self.name, self._value)
+        self._value = 1 if value else 0
+        self.bus.write('gpio', self.name, self._value)
+        return self._value
+
+    def high(self):
+        return self.value(1)
+
+    def low(self):
+        return self.value(0)
+
+    on = high
+    off = low
+
+
+class SimPWM(object):
+    '''
+    PWM channel on the Robot HAT MCU; every register write is one I2C
+    transaction.
+    '''
+    bus = None
+
+    def __init__(self, channel, address=None):
+        self.channel = channel
+        self._period = 4095
+        self._prescaler = 10
+        self._pulse_width = 0
+
+    def period(self, arr=None):
+        if arr is None:
+            return self._period
+        self._period = int(arr)
+        self.bus.write('i2c', self.channel, ('period', self._period))
+
+    def prescaler(self, prescaler=None):
+        if prescaler is None:
+            return self._prescaler
+        self._prescaler = int(prescaler)
+        self.bus.write('i2c', self.channel, ('prescaler', self._prescaler))
+
+    def pulse_width(self, pulse_width=None):
+        if pulse_width is None:
+            return self._pulse_width
+        self._pulse_width = int(pulse_width)
+        self.bus.write('i2c', self.channel, self._pulse_width)
+
+    def pulse_width_percent(self, percent=None):
+        if percent is None:
+            return self._pulse_width / self._period * 100.0
+        self.pulse_width(percent / 100.0 * self._period)
+
+
+class SimServo(SimPWM):
+    '''
+    Servo on a PWM channel, angle mapped to a 500-2500 us pulse at 50 Hz.
+    '''
+    MAX_PW = 2500
+    MIN_PW = 500
+    PERIOD = 4095
+
+    def __init__(self, channel, address=None):
+        super().__init__(channel, address)
+        self._angle = 0
+
+    def angle(self, angle=None):
+        if angle is None:
+            return self._angle
+        self._angle = max(-90, min(90, angle))
+        pulse_us = (self._angle + 90) / 180 * (self.MAX_PW - self.MIN_PW) + self.MIN_PW
+        self.pulse_width(pulse_us / 20000 * self.PERIOD)
+
+
+class SimADC(object):
+    '''
+    ADC channel; returns the value stored in the backend's adc_values.
+    '''
+    bus = None
+    values = None
+
+    def __init__(self, chn, address=None):
+        self.channel = chn if isinstance(chn, str) else "A%d" % chn
+
+    def read(self):
+        return self.bus.read('i2c', self.channel, self.values.get(self.channel, 1500))
+
+    def read_voltage(self):
+        return self.read() * 3.3 / 4095
+
+
+class SimGrayscale_Module(object):
+    '''
+    Three channel grayscale module built on SimADC channels.
+    '''
+    LEFT = 0
+    MIDDLE = 1
+    RIGHT = 2
+
+    def __init__(self, pin0, pin1, pin2, reference=None):
+        self.pins = (pin0, pin1, pin2)
+        self._reference = reference if reference is not None else [1000, 1000, 1000]
+
+    def reference(self, ref=None):
+        if ref is not None:
+            self._reference = ref
+        return self._reference
+
+    def read(self, channel=None):
+        if channel is None:
+            return [pin.read() for pin in self.pins]
+        return self.pins[channel].read()
+
+    def read_status(self, datas=None):
+        if datas is None:
+            datas = self.read()
+        return [0 if data > self._reference[i] else 1 for i, data in enumerate(datas)]
+
+
+class SimUltrasonic(object):
+    '''
+    HC-SR04 style ultrasonic sensor. The distance is taken from the
+    backend's ultrasonic_distance; None means no echo, in which case read()
+    blocks for the full timeout on every attempt like the real driver.
+    '''
+    SOUND_SPEED = 343.3  # m/s
+    hat = None
+
+    def __init__(self, trig, echo, timeout=0.02):
+        self.trig = trig
+        self.echo = echo
+        self.timeout = timeout
+
+    def _read(self):
+        self.trig.value(1)
+        self.trig.value(0)
+        distance = self.hat.ultrasonic_distance
+        if distance is None:
+            time.sleep(self.timeout)
+            return -1
+        time.sleep(distance / 100 * 2 / self.SOUND_SPEED)
+        return round(distance, 2)
+
+    def read(self, times=10):
+        for _ in range(times):
+            result = self._read()
+            if result != -1:
+                return result
+        return -1
+
+
+class SimFileDB(object):
+    '''
+    In-memory replacement for fileDB. Reads the config file if it exists but
+    never writes it back; set() is recorded on the bus as a file rewrite.
+    '''
+    bus = None
+
+    def __init__(self, db, mode=None, owner=None):
+        self.db = db
+        self.values = {}
+        try:
+            with open(db) as f:
+                for line in f:
+                    line = line.strip()
+                    if not line or line.startswith('#') or '=' not in line:
+                        continue
+                    name, value = line.split('=', 1)
+                    self.values[name.strip()] = value.strip()
+        except OSError:
+            pass
+
+    def get(self, name, default_value=None):
+        return self.values.get(name, default_value)
+
+    def set(self, name, value):
+        self.values[name] = str(value)
+        self.bus.write('file', self.db, (name, str(value)))
+
+
+class SimCalibrationStore(CalibrationStore):
+    '''
+    CalibrationStore that reads the real config but records flushes on the
+    bus instead of writing the file.
+    '''
+    bus = None
+
+    def _write(self, content):
+        self.bus.write('file', self.db, content)
+
+
+class SimUtils(object):
+    bus = None
+    FIRMWARE = (1, 0, 0)
+
+    def get_firmware_version(self):
+        return list(self.bus.read('i2c', 'FIRMWARE', self.FIRMWARE))
+
+    def reset_mcu(self):
+        self.bus.write('gpio', 'MCURST', 0)
+        time.sleep(0.01)
+        self.bus.write('gpio', 'MCURST', 1)
+        time.sleep(0.01)
+
+
+class SimHat(object):
+    '''
+    Simulated robot_hat backend for Picarx. Exposes the same names the driver
+    imports from robot_hat (Pin, PWM, Servo, ADC, Grayscale_Module,
+    Ultrasonic, fileDB, utils) plus a CalibrationStore, all bound to one
+    SimBus.
+
+        hat = SimHat()
+        px = Picarx(backend=hat)
+        ...
+        print(hat.bus.count('i2c'))
+
+    adc_values and ultrasonic_distance set what the sensors read back.
+    '''
+    def __init__(self, bus=None, adc_values=None, ultrasonic_distance=100.0):
+        self.bus = bus if bus is not None else SimBus()
+        self.adc_values = adc_values if adc_values is not None else {}
+        self.ultrasonic_distance = ultrasonic_distance
+        bound = {'bus': self.bus}
+        self.Pin = type('Pin', (SimPin,), bound)
+        self.PWM = type('PWM', (SimPWM,), bound)
+        self.Servo = type('Servo', (SimServo,), bound)
+        self.ADC = type('ADC', (SimADC,), dict(bound, values=self.adc_values))
+        self.Grayscale_Module = SimGrayscale_Module
+        self.Ultrasonic = type('Ultrasonic', (SimUltrasonic,), {'hat': self})
+        self.fileDB = type('fileDB', (SimFileDB,), bound)
+        self.CalibrationStore = type('CalibrationStore', (SimCalibrationStore,), bound)
+        self.utils = type('utils', (SimUtils,), bound)()
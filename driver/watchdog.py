@@ -0,0 +1,150 @@
+import threading
+import time
+
+
+class Watchdog(object):
+    '''
+    Stops the motors when the control loop stops talking to them.
+
+    The loop calls feed() at least once per deadline; Actuator.submit()
+    feeds it on every command. A dedicated thread checks at RATE Hz, and
+    once deadline seconds pass without a heartbeat it calls px.stop()
+    itself, so a hung lidar read, inference call or websocket never leaves
+    the last motor power applied. The motors stay stopped until the loop
+    sends its next command.
+
+    feed(stage) also names the stage the loop is about to run. A deadline
+    miss is logged with the stage that stalled, how long it has been
+    running and how long the stop took, and counted in stats():
+
+        watchdog = Watchdog(px).start()
+        actuator = Actuator(px, watchdog=watchdog).start()
+        while True:
+            watchdog.feed("sensors")
+            ...
+            watchdog.feed("decision")
+            actuator.submit(ap.run_step(sensor_inputs))
+
+    The watchdog arms on the first feed, so slow startup (loading a model,
+    connecting) does not count as a stall.
+    '''
+    RATE = 50          # Hz
+    DEADLINE = 0.25    # seconds, five autopilot ticks
+
+    def __init__(self, px, deadline=DEADLINE, rate=RATE):
+        '''
+        param deadline: seconds without a heartbeat before stopping the motors
+        '''
+        self.px = px
+        self.deadline = deadline
+        self.period = 1.0 / rate
+        self.stage = None
+        self.stage_time = None
+        self.fed_time = None       # last heartbeat, None until armed
+        self.tripped = False
+        self._tripped_fed = None
+        self._tripped_stage = None
+        self.misses = 0
+        self.stage_misses = {}     # stage -> deadline misses
+        self.last_stall = None     # seconds without a heartbeat, last miss
+        self.max_stall = 0.0
+        self.last_latency = None   # deadline passed to motors stopped, seconds
+        self.max_latency = 0.0
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._running = True
+            self._thread = threading.Thread(target=self._loop, name="watchdog", daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self, timeout=1.0):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def feed(self, stage=None):
+        '''
+        Heartbeat. param stage: name of the stage the loop runs next, None
+        to stay in the current one.
+        '''
+        now = time.monotonic()
+        if stage is not None and stage != self.stage:
+            self.stage = stage
+            self.stage_time = now
+        self.fed_time = now
+
+    def age(self):
+        '''
+        Seconds since the last heartbeat, 0 until armed.
+        '''
+        if self.fed_time is None:
+            return 0.0
+        return time.monotonic() - self.fed_time
+
+    def _trip(self, fed, now):
+        stage = self.stage
+        stage_time = self.stage_time
+        # set first, so the Actuator stops stepping motion profiles before
+        # the stop goes out and none can ramp the motors back up after it
+        self.tripped = True
+        try:
+            self.px.stop()
+        except Exception:
+            # retried every cycle until the stop goes through
+            self.tripped = False
+            raise
+        stopped = time.monotonic()
+        self._tripped_fed = fed
+        self._tripped_stage = stage
+        latency = stopped - (fed + self.deadline)
+        self.last_latency = latency
+        self.max_latency = max(self.max_latency, latency)
+        self.misses += 1
+        self.stage_misses[stage] = self.stage_misses.get(stage, 0) + 1
+        in_stage = "%.1f ms in %s" % ((now - stage_time) * 1000, stage) if stage_time is not None else "no stage"
+        print("[Watchdog] no heartbeat for %.1f ms (deadline %.0f ms, %s): stopped %.1f ms past the deadline"
+              % ((now - fed) * 1000, self.deadline * 1000, in_stage, latency * 1000))
+
+    def _recover(self, fed):
+        stall = fed - self._tripped_fed
+        self.last_stall = stall
+        self.max_stall = max(self.max_stall, stall)
+        self.tripped = False
+        print("[Watchdog] heartbeat back after %.1f ms, stalled in %s" % (stall * 1000, self._tripped_stage))
+
+    def _loop(self):
+        deadline = time.monotonic()
+        while self._running:
+            fed = self.fed_time
+            if fed is not None:
+                now = time.monotonic()
+                if not self.tripped:
+                    if now - fed > self.deadline:
+                        try:
+                            self._trip(fed, now)
+                        except Exception as e:
+                            print("[Watchdog] stop failed: %s" % e)
+                elif fed != self._tripped_fed:
+                    self._recover(fed)
+            deadline += self.period
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                deadline = time.monotonic()
+
+    def stats(self):
+        '''
+        Deadline misses, and stall and stop times in milliseconds.
+        '''
+        return {
+            "misses": self.misses,
+            "stages": dict(self.stage_misses),
+            "last_stall_ms": self.last_stall * 1000 if self.last_stall is not None else None,
+            "max_stall_ms": self.max_stall * 1000,
+            "max_latency_ms": self.max_latency * 1000,
+        }
@@ -1,78 +1,70 @@
 import sys, os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
 from driver.picarx import Picarx
-from autopilot.autopilot import Autopilot, SensorInputs
+from driver.actuator import Actuator
+from driver.reflex import SafetyReflex
+from driver.watchdog import Watchdog
+from autopilot.scheduler import RateScheduler
+from autopilot.recorder import FlightRecorder
+from autopilot.profiler import PhaseProfiler
+from autopilot.autopilot import SensorInputs
+from autopilot.autodrive import ContinuousDrivePilot
 from sensors import lidar
+from sensors.ultrasonic import UltrasonicSampler
 from time import sleep
 
-px = Picarx()
+px = Picarx(warm_start=True)
 
-class AutoDrivePilot(Autopilot):
+def main():
+    ap = ContinuousDrivePilot()
+    # measured by example/characterize.py
+    ap.load_kinematics()
+    # set AUTOPILOT_PROFILE=1 to time the loop phases
+    profiler = PhaseProfiler()
+    px.enable_motion_profiles()
+    # stops the motors if the loop below stalls; misses are logged by stage
+    watchdog = Watchdog(px).start()
+    actuator = Actuator(px, profiler=profiler, watchdog=watchdog).start()
+    # the reflex owns the lidar and stops the motors on its own
+    reflex = SafetyReflex(px, lidar.read).start()
+    ap.attach_reflex(reflex.event)
+    ap.recorder = FlightRecorder(state_names=ap.STATE_NAMES).install()
+    ultrasonic = UltrasonicSampler(px.ultrasonic).start()
+    sin = SensorInputs()
 
+    def sense():
+        watchdog.feed("sensors")
+        with profiler.span("sensors"):
+            sin.ultrasonic_distance, sin.ultrasonic_age = ultrasonic.latest()
+            sin.lidar_distance = reflex.lidar_distance
 
-    def run_step(self, sensor_inputs: SensorInputs = None):
-        if sensor_inputs is None:
-            raise ValueError("Sensor inputs must be provided")
-        self.sensor_inputs = sensor_inputs
+    def plan():
+        watchdog.feed("decision")
+        with profiler.span("decision"):
+            cmd = ap.run_step(sin)
+        actuator.submit(cmd)
+        # print(f"Speed: {cmd.speed}, Angle: {cmd.angle}, Distance: {sin.ultrasonic_distance}, State: {ap.state}")
 
-        if self.state == self.STATE_READY:
-            return self.cruise()
-        elif self.state == self.STATE_CRUISING:
-            self.d_threshold = self.D_THRESHOLD_BASE
-            self.scan = self.pan_tilt_scan
-            if self.check_obstacle():
-                return self.scan()
-            return self.cruise()
-        elif self.state == self.STATE_SCANNING:
-            if self.step >= self.num_steps:
-                self.step = 0
-                if self.max_dist < self.d_threshold:
-                    self.log(f"Obstacle too close, backing up, d_threshold: {self.d_threshold}, max_dist: {self.max_dist}")
-                    self.increase_scan_threshold()
-                    self.scan = self.full_rotate_scan
-                    return self.back()
-                else:
-                    print("!!!!!!!!!!", self.target_angle)
-                    angle = self.target_angle if self.target_angle < 180 else self.target_angle - 360
-                    return self.turn(angle)
-            return self.scan()
-        elif self.state == self.STATE_TURNING:
-            if self.step >= self.num_steps:
-                self.step = 0
-                return self.cruise()
-            return self.turn()
-        elif self.state == self.STATE_BACKING:
-            if not self.check_obstacle():
-                self.step = 0
-                return self.scan()
-            if self.step >= self.num_steps:
-                self.step = 0
-                return self.scan()
-            return self.back()
-        elif self.state == self.STATE_STOPPED:
-            return self.stop()
-        if sensor_inputs.ultrasonic_distance < self.D_THRESHOLD:
-            self.scan()
+    scheduler = RateScheduler()
+    scheduler.add("sense", 50, sense)
+    scheduler.add("plan", 1 / ap.FREQ, plan)
 
-def main():
-    ap = Autopilot()
-    sin = SensorInputs()
-    while True:
-        # sin.ultrasonic_distance = px.get_distance() #New version of vehicle does not use this
-        sin.ultrasonic_distance = 100  #Dummy value, not used
-        sin.lidar_distance = lidar.read()[0] if lidar.read() else sin.lidar_distance
+    def report():
+        watchdog.feed("report")
+        ap.log(scheduler.summary())
+        profiler.report(ap.log)
 
-        cmd = ap.run(sin)
-        speed, angle, pan, tilt= cmd.speed, cmd.angle, cmd.pan, cmd.tilt
-        px.dir_current_angle = angle
-        px.turn(0)
-        px.left_motor_base_power = speed 
-        px.right_motor_base_power = speed
-        px.update_motor()
-
-        px.set_cam_pan_angle(pan)
-        px.set_cam_tilt_angle(tilt)
-        # print(f"Speed: {speed}, Angle: {angle}, Distance: {sin.ultrasonic_distance}, State: {ap.state}")
+    scheduler.add("report", 0.2, report)
+    try:
+        scheduler.run()
+    except Exception:
+        ap.recorder.dump()
+        raise
+    finally:
+        watchdog.close()
+        ultrasonic.close()
+        reflex.close()
+        actuator.close()
 
 if __name__ == "__main__":
     try:
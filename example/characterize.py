@@ -0,0 +1,56 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+from driver.picarx import Picarx
+from driver.actuator import Actuator
+from driver.watchdog import Watchdog
+from autopilot.scheduler import RateScheduler
+from autopilot.autopilot import SensorInputs
+from autopilot.characterize import CharacterizationPilot
+from autopilot.kinematics import KINEMATICS_FILE
+from sensors import lidar
+
+# Measure speed and turn rate across power levels and steering angles, and
+# store them for Autopilot.load_kinematics(). Set the car down facing a
+# wall 2-3 m away, with room to turn in place.
+
+px = Picarx(warm_start=True)
+
+def main(path=KINEMATICS_FILE):
+    ap = CharacterizationPilot()
+    # measure the car as the autopilot drives it, with ramped motor power
+    px.enable_motion_profiles()
+    watchdog = Watchdog(px).start()
+    actuator = Actuator(px, watchdog=watchdog).start()
+    sin = SensorInputs()
+
+    def sense():
+        watchdog.feed("sensors")
+        reading = lidar.read()
+        if reading is not None:
+            sin.lidar_distance = reading[0]
+
+    scheduler = RateScheduler()
+
+    def plan():
+        watchdog.feed("decision")
+        actuator.submit(ap.run_step(sin))
+        if ap.done:
+            scheduler.stop()
+
+    scheduler.add("sense", 50, sense)
+    scheduler.add("plan", 1 / ap.FREQ, plan)
+    try:
+        scheduler.run()
+    finally:
+        watchdog.close()
+        actuator.close()
+    ap.table.save(path)
+    ap.log(f"Kinematics tables written to {path}")
+
+if __name__ == "__main__":
+    try:
+        main(*sys.argv[1:])
+    except Exception as e:    
+        print("error:%s" % e)
+    finally:
+        px.stop()
@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
 
-from robot_hat.utils import reset_mcu
-from driver.picarx import Picarx
+from driver.picarx import Picarx, constrain
+from driver.actuator import Actuator
+from autopilot.autopilot import Command
 from robot_hat import Music,TTS
 from vilib import Vilib
 from time import sleep, time, strftime, localtime
@@ -12,10 +13,9 @@ import os
 user = os.getlogin()
 user_home = os.path.expanduser(f'~{user}')
 
-reset_mcu()
-sleep(0.2)
-
-px = Picarx()
+# Picarx resets the MCU itself unless it is already initialized
+px = Picarx(warm_start=True)
+actuator = Actuator(px)
 music = Music()
 music.music_set_volume(20)
 tts = TTS()
@@ -65,6 +65,9 @@ def main(px):
     
     tts.lang("en-US")
 
+    # teleop state; the actuator thread does the bus writes
+    command = Command()
+    actuator.start()
     run = True
     while run:
         flush_stdin()
@@ -73,45 +76,44 @@ def main(px):
         if c in KEY_MAP:
             cmd = KEY_MAP[c]
             if cmd == "forward":
-                px.accelerate(10)
+                command.speed = constrain(command.speed + 10, -100, 100)
                 # print("forward")
             if cmd == "backward":
-                px.accelerate(-30)
+                command.speed = constrain(command.speed - 30, -100, 100)
                 # print("backward")
             if cmd == "right":
-                px.turn(5)
-                px.accelerate(10)
+                command.angle = constrain(command.angle + 5, px.DIR_MIN, px.DIR_MAX)
+                command.speed = constrain(command.speed + 10, -100, 100)
                 # print("right")
             if cmd == "left":
-                px.turn(-5)
-                px.accelerate(10)
+                command.angle = constrain(command.angle - 5, px.DIR_MIN, px.DIR_MAX)
+                command.speed = constrain(command.speed + 10, -100, 100)
                 # print("left")
             if cmd == "stop":
                 print("stop")
-                px.stop()
+                command.speed = 0
+                actuator.halt()
                 continue
             if cmd == "look_up":
-                px.tilt_up()
+                command.tilt = min(px.CAM_TILT_MAX, command.tilt + 5)
             if cmd == "look_down":
-                px.tilt_down()
+                command.tilt = max(px.CAM_TILT_MIN, command.tilt - 5)
             if cmd == "look_right":
-                px.pan_right()
+                command.pan = min(px.CAM_PAN_MAX, command.pan + 5)
             if cmd == "look_left":
-                px.pan_left()
+                command.pan = max(px.CAM_PAN_MIN, command.pan - 5)
             if cmd == 'center':
-                px.pan_angle = 0
-                px.tilt_angle = 0
+                command.pan = 0
+                command.tilt = 0
             if cmd == "hi":
                 tts.say("Hello!")
         else:
-            px.stop()
-            if px.dir_current_angle > 0:
-                px.turn(max(-10, 0 - px.dir_current_angle))
-            elif px.dir_current_angle < 0:
-                px.turn(min(10, 0 - px.dir_current_angle)) 
-        px.update_motor()
-        px.update_pan()
-        px.update_tilt()
+            command.speed = 0
+            if command.angle > 0:
+                command.angle += max(-10, 0 - command.angle)
+            elif command.angle < 0:
+                command.angle += min(10, 0 - command.angle)
+        actuator.submit(command)
 
 
 if __name__ == "__main__":
@@ -121,7 +123,7 @@ if __name__ == "__main__":
     except Exception as e:    
         print("error:%s"%e)
     finally:
-        px.stop()
+        actuator.close()
         Vilib.camera_close()
 
 
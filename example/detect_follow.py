@@ -6,6 +6,9 @@ from comm.server import Server
 import asyncio
 import sensors.lidar as lidar
 from driver.picarx import Picarx
+from driver.actuator import Actuator
+from driver.watchdog import Watchdog
+from autopilot.autopilot import Command
 import cv2
 import time
 from PIL import Image
@@ -16,7 +19,7 @@ H = 480
 JPEG_QUALITY = 75  # Reduce from default 95
 X_CENTER = W // 2
 Y_CENTER = H // 2
-def tracker(px, x, y, angles):
+def tracker(actuator, x, y, angles):
     '''
     Track the object using PicarX
     '''
@@ -24,10 +27,8 @@ def tracker(px, x, y, angles):
     x_angle, y_angle = angles
     # Calculate the error from the center
     x_angle += (x-X_CENTER) / W * 35 * 0.6
-    px.set_cam_pan_angle(x_angle)
-
     y_angle += -(y - Y_CENTER) / H * 35 * 0.6
-    px.set_cam_tilt_angle(y_angle)
+    actuator.submit(Command(0, 0, x_angle, y_angle))
 
     angles[0] = x_angle
     angles[1] = y_angle
@@ -67,7 +68,6 @@ async def video_streamer(server):
     Stream video frames using the server
     """
     camera = get_camera_instance()
-    px = Picarx()
     if camera is None:
         print("Failed to initialize camera. Exiting...")
         return
@@ -83,6 +83,13 @@ async def video_streamer(server):
     angles = [0, 0]  # Initial angles for pan and tilt
     refresh_rate = 20  # Target refresh rate in FPS
     idle_count = 0
+    px = Picarx(warm_start=True)
+    # smooth pan/tilt moves instead of jumping to each new angle
+    px.enable_motion_profiles()
+    # stops the motors if a frame, lidar read or the websocket hangs; both
+    # threads start right before the try, so every exit closes them
+    watchdog = Watchdog(px).start()
+    actuator = Actuator(px, watchdog=watchdog).start()
     try:
         while True:
             time_start = time.time()
@@ -92,6 +99,7 @@ async def video_streamer(server):
             # img = camera.capture_frame()
             # img = process_frame(img)
             # img = fast_encode_frame(img, quality=JPEG_QUALITY)
+            watchdog.feed("camera")
             img = camera.capture_frame_base64(resize_to=(W, H))
             
             if img is None:
@@ -100,6 +108,7 @@ async def video_streamer(server):
                 continue
             
             # Get sensor data
+            watchdog.feed("lidar")
             lidar_data = lidar.read()
             sensor_data = {
                 "lidar_distance": lidar_data[0] if lidar_data else None
@@ -115,9 +124,11 @@ async def video_streamer(server):
             }
             
             # Send data through server (time this)
+            watchdog.feed("send")
             await server.send_data(data)
             
             # Check for commands
+            watchdog.feed("receive")
             command = await server.receive_data()
             if command is not None:
                 print(f"Received command: {command}")
@@ -126,19 +137,19 @@ async def video_streamer(server):
                 if detections:
                     idle_count = 0
                     x, y = detections[0][0], detections[0][1]
-                    tracker(px, x, y, angles)
+                    tracker(actuator, x, y, angles)
                 else:
                     idle_count += 1
                     if idle_count > refresh_rate:  # If idle for too long, reset tracking
                         idle_count = 0
                         angles[0] = angles[1] = 0  # Reset angles if no detections
-                        tracker(px, X_CENTER, Y_CENTER, angles)  # Reset tracking if no detections
+                        tracker(actuator, X_CENTER, Y_CENTER, angles)  # Reset tracking if no detections
             else:
                 idle_count += 1
                 if idle_count > refresh_rate:
                     idle_count = 0
                     angles[0] = angles[1] = 0  # Reset angles if no command
-                    tracker(px, X_CENTER, Y_CENTER, angles)  # Reset tracking if no command
+                    tracker(actuator, X_CENTER, Y_CENTER, angles)  # Reset tracking if no command
             # Control frame rate (~30 FPS)
             duration = time.time() - time_start
             sleep_time = max(0, (1 / refresh_rate) - duration)
@@ -147,6 +158,8 @@ async def video_streamer(server):
     except Exception as e:
         print(f"Error in video streamer: {e}")
     finally:
+        watchdog.close()
+        actuator.close()
         close_camera()
         print("Camera closed")
 
@@ -1,160 +1,81 @@
 import sys, os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
 from driver.picarx import Picarx
-from autopilot.autopilot import Autopilot, SensorInputs, Command
+from driver.actuator import Actuator
+from driver.reflex import SafetyReflex
+from driver.watchdog import Watchdog
+from autopilot.scheduler import RateScheduler
+from autopilot.recorder import FlightRecorder
+from autopilot.profiler import PhaseProfiler
+from autopilot.autopilot import SensorInputs
+from autopilot.pest_control import PestControlPilot
 from sensors import lidar
-from sensors.camera import get_camera_instance
+from sensors.ultrasonic import UltrasonicSampler
 from time import sleep
-from vision.fly.detect import FlyYOLO
+from vision.worker import PerceptionWorker
 
-px = Picarx()
-
-class AutoDrivePilot(Autopilot):
-    STATE_FLY_DETECTION=0
-    STATE_SPRAY_PESTICIDE=1
-
-    def __init__(self, px, fly_detect=None):
-        super().__init__()
-        #print all class attributes
-        print(dir(self))
-        self.px = px
-        self.camera = get_camera_instance()
-        self.model = fly_detect if fly_detect is not None else FlyYOLO()
-        if self.camera is None:
-            print("Failed to initialize camera. Exiting...")
-            exit(1)
-    
-    def change_state_hook(self):
-        #Sleep to reduce instantaneous motor current spike
-        self.px.stop()
-        sleep(1.5)
-
-    
-    def spray_pesticide(self):
-        if self.state != self.STATE_SPRAY_PESTICIDE:
-            self.change_state(self.STATE_SPRAY_PESTICIDE)
-
-        # Initialize scan if not already started
-        if self.step == 0:
-            self.num_steps = 60
-            self.px.activate_pump()
-            self.log("Pesticide spray activated")
-
-        pan = -30 + (self.step * 60 / self.num_steps)
-        tilt = -10
-        self.step += 1
-        return Command(0, 0, pan, tilt)
-
-    def fly_detect(self):
-        if self.state != self.STATE_FLY_DETECTION:
-            self.change_state(self.STATE_FLY_DETECTION)
-
-        # Initialize scan if not already started
-        if self.step == 0:
-            self.num_steps = 60
-            
-        #Run fly detection model
-        frame = self.camera.capture_frame()
-        if frame is not None:
-            detections = self.model.get_detection_centers(frame)
-            if detections:
-                #early exit if fly detected
-                self.step=self.num_steps
-                self.function_queue.insert(0, self.spray_pesticide)
-
-        else:
-            self.log("Failed to capture frame")
-
-        pan = -30 + (self.step * 60 / self.num_steps)
-        tilt = -10
-        self.step += 1
-        return Command(0, 0, pan, tilt)
-
-    def scan_area(self):
-        self.scan = self.pan_tilt_scan
-        
-        #First, turn 45 degrees to the right and scan)
-        turn_func = lambda: self.init_turn(45)
-        self.function_queue.append(turn_func)
-        self.function_queue.append(self.fly_detect)
-        turn_back_func = lambda: self.init_turn(-45)
-        self.function_queue.append(turn_back_func)
-        self.function_queue.append(self.cruise)
-        return
-
-    def run_step(self, sensor_inputs: SensorInputs = None):
-        if sensor_inputs is None:
-            raise ValueError("Sensor inputs must be provided")
-        self.sensor_inputs = sensor_inputs
-        print(f"State: {self.state}, Step: {self.step}")
-        if self.state == self.STATE_READY:
-            return self.function_queue.pop(0)()
-        elif self.state == self.STATE_CRUISING:
-            print(self.step)
-            self.d_threshold = self.D_THRESHOLD_BASE
-            self.scan = self.pan_tilt_scan
-            if self.check_obstacle():
-                return self.stop()
-
-            # Scan area every 1 meter
-            d = self.get_cruise_dist()
-            print(f"Cruised {d} meters")
-            if d > 1.0:
-                self.log(f"Cruised {d} meters, scanning area")
-                self.scan_area()
-                return self.function_queue.pop(0)()
-            return self.cruise()
-        elif self.state == self.STATE_FLY_DETECTION:
-            print(self.step)
-            if self.step >= self.num_steps:
-                self.step = 0
-                return self.function_queue.pop(0)()  # Return the result of next function
-            return self.fly_detect()
-        elif self.state == self.STATE_SPRAY_PESTICIDE:
-            print(self.step)
-            if self.step >= self.num_steps:
-                self.step = 0
-                self.px.deactivate_pump()
-                self.log("Pesticide spray deactivated")
-                return self.function_queue.pop(0)()  # Return the result of next function
-            return self.spray_pesticide()
-        elif self.state == self.STATE_TURNING:
-            print(self.step)
-            if self.step >= self.num_steps:
-                self.step = 0
-                return self.function_queue.pop(0)()  # Return the result of next function
-            return self.turn()
-        elif self.state == self.STATE_BACKING:
-            if not self.check_obstacle():
-                self.step = 0
-                return self.function_queue.pop(0)()  # Return the result of next function
-            if self.step >= self.num_steps:
-                self.step = 0
-                return self.function_queue.pop(0)()  # Return the result of next function
-            return self.back()
-        elif self.state == self.STATE_STOPPED:
-            return self.stop()
+px = None
 
 def main():
-    model = FlyYOLO()
-    ap = AutoDrivePilot(px, model)
+    global px
+    # fork the detector before any other thread starts; it owns the camera
+    # set AUTOPILOT_PROFILE=1 to time the loop phases
+    profiler = PhaseProfiler()
+    perception = PerceptionWorker(profiler=profiler).start()
+    # only now: a cold start opens the calibration store, which starts a thread
+    px = Picarx(warm_start=True)
+    # Ramp motor power instead of pausing on every state change to avoid
+    # instantaneous motor current spikes
+    px.enable_motion_profiles()
+    # stops the motors if the loop below stalls; misses are logged by stage
+    watchdog = Watchdog(px).start()
+    actuator = Actuator(px, profiler=profiler, watchdog=watchdog).start()
+    ap = PestControlPilot(pump=lambda on: actuator.call(px.activate_pump if on else px.deactivate_pump))
+    # measured by example/characterize.py
+    ap.load_kinematics()
+    # the reflex owns the lidar and stops the motors on its own
+    reflex = SafetyReflex(px, lidar.read).start()
+    ap.attach_reflex(reflex.event)
+    ap.recorder = FlightRecorder(state_names=ap.STATE_NAMES).install()
+    ultrasonic = UltrasonicSampler(px.ultrasonic).start()
     sin = SensorInputs()
-    while True:
-        # sin.ultrasonic_distance = px.get_distance() #New version of vehicle does not use this
-        sin.ultrasonic_distance = 100  #Dummy value, not used
-        sin.lidar_distance = lidar.read()[0] if lidar.read() else sin.lidar_distance
 
-        cmd = ap.run(sin)
-        speed, angle, pan, tilt= cmd.speed, cmd.angle, cmd.pan, cmd.tilt
-        px.dir_current_angle = angle
-        px.turn(0)
-        px.left_motor_base_power = speed 
-        px.right_motor_base_power = speed
-        px.update_motor()
-
-        px.set_cam_pan_angle(pan)
-        px.set_cam_tilt_angle(tilt)
-        # print(f"Speed: {speed}, Angle: {angle}, Distance: {sin.ultrasonic_distance}, State: {ap.state}")
+    def sense():
+        watchdog.feed("sensors")
+        with profiler.span("sensors"):
+            sin.ultrasonic_distance, sin.ultrasonic_age = ultrasonic.latest()
+            sin.lidar_distance = reflex.lidar_distance
+            sin.detections, sin.detection_age = perception.latest()
+
+    def plan():
+        watchdog.feed("decision")
+        with profiler.span("decision"):
+            cmd = ap.run_step(sin)
+        actuator.submit(cmd)
+        # print(f"Speed: {cmd.speed}, Angle: {cmd.angle}, Distance: {sin.ultrasonic_distance}, State: {ap.state}")
+
+    scheduler = RateScheduler()
+    scheduler.add("sense", 50, sense)
+    scheduler.add("plan", 1 / ap.FREQ, plan)
+
+    def report():
+        watchdog.feed("report")
+        ap.log(scheduler.summary())
+        ap.log("Surveyed %.1f m^2, %.2f m^2 per minute", ap.coverage.surveyed_area(), ap.coverage_rate())
+        profiler.report(ap.log)
+
+    scheduler.add("report", 0.2, report)
+    try:
+        scheduler.run()
+    except Exception:
+        ap.recorder.dump()
+        raise
+    finally:
+        watchdog.close()
+        ultrasonic.close()
+        reflex.close()
+        actuator.close()
+        perception.close()
 
 if __name__ == "__main__":
     try:
@@ -162,4 +83,5 @@ if __name__ == "__main__":
     except Exception as e:    
         print("error:%s" % e)
     finally:
-        px.stop()
\ No newline at end of file
+        if px is not None:
+            px.stop()
\ No newline at end of file
@@ -0,0 +1,104 @@
+import threading
+import time
+
+
+class UltrasonicSampler:
+    """
+    Background sampler for one or more HC-SR04 ultrasonic sensors.
+
+    robot_hat's Ultrasonic.read() retries up to 10 times with a 20 ms
+    timeout each, so a missing echo stalls the caller for up to 200 ms.
+    This sampler instead fires a single ping per slot with a strict timeout
+    budget, on its own thread, and keeps the latest reading per sensor.
+    Sensors are pinged round-robin with at least PING_INTERVAL between any
+    two pings, so a late echo from one ping is never taken for the next.
+
+    A ping that fails, by an exception or no echo within the budget, is
+    not a sample: the previous reading stands and its age keeps growing,
+    so a dead or disconnected sensor reads as stale rather than as a clear
+    path. robot_hat cannot tell a missing sensor from nothing in range, so
+    consumers treat an old reading as unknown.
+
+    Pings go through the public Ultrasonic.read(times=1). The budget is set
+    on the sensor's timeout attribute, which robot_hat's
+    Ultrasonic(trig, echo, timeout=0.02) keeps and read() waits on for
+    each attempt; SimUltrasonic (driver/sim.py) does the same.
+    """
+    PING_INTERVAL = 0.06   # seconds between pings, per the HC-SR04 datasheet
+    TIMEOUT_BUDGET = 0.015 # seconds per ping, ~2.5 m of range
+
+    def __init__(self, sensors, ping_interval=PING_INTERVAL, timeout_budget=TIMEOUT_BUDGET):
+        """
+        Args:
+            sensors: an Ultrasonic (e.g. px.ultrasonic) or a dict of name -> Ultrasonic
+            ping_interval (float): minimum time between two pings
+            timeout_budget (float): maximum time to wait for one echo
+        """
+        if not isinstance(sensors, dict):
+            sensors = {"front": sensors}
+        self.sensors = sensors
+        self.ping_interval = ping_interval
+        self.timeout_budget = timeout_budget
+        for sensor in sensors.values():
+            sensor.timeout = timeout_budget
+        self._latest = {name: (float('inf'), 0.0) for name in sensors}
+        self.timeouts = {name: 0 for name in sensors}   # failed pings in all
+        self.failures = {name: 0 for name in sensors}   # failed pings since the last echo
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._running = True
+            self._thread = threading.Thread(target=self._loop, name="ultrasonic", daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self, timeout=1.0):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def latest(self, name="front"):
+        """
+        Get the newest reading of a sensor.
+
+        Returns:
+            tuple: (distance in cm, age in seconds) of the last ping that
+            got an echo; while pings fail the age keeps growing, and before
+            the first echo it is inf (distance inf)
+        """
+        distance, stamp = self._latest[name]
+        if not stamp:
+            return distance, float('inf')
+        return distance, time.monotonic() - stamp
+
+    def _loop(self):
+        names = list(self.sensors)
+        i = 0
+        next_ping = time.monotonic()
+        while self._running:
+            name = names[i % len(names)]
+            i += 1
+            delay = next_ping - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            next_ping = time.monotonic() + self.ping_interval
+            try:
+                distance = self.sensors[name].read(1)
+                error = None
+            except Exception as e:
+                distance = -1
+                error = e
+            if distance < 0:
+                # no sample: keep the last one, so its age shows the failure
+                self.timeouts[name] += 1
+                self.failures[name] += 1
+                if self.failures[name] == 1:
+                    print(f"Ultrasonic {name} read failed: {error if error is not None else 'no echo'}")
+                continue
+            if self.failures[name]:
+                print(f"Ultrasonic {name} back after {self.failures[name]} failed pings")
+                self.failures[name] = 0
+            self._latest[name] = (distance, time.monotonic())
@@ -0,0 +1,2 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
\ No newline at end of file
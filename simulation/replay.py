@@ -0,0 +1,158 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+import argparse
+import bisect
+import contextlib
+import json
+import threading
+import time
+from autopilot.autopilot import SensorInputs
+from autopilot.recorder import load
+from simulation.runner import VirtualClock, load_pilot
+
+COMMAND_FIELDS = ("speed", "angle", "pan", "tilt")
+
+
+def sensor_inputs(tick, sin=None):
+    """
+    Rebuild the SensorInputs of a recorded tick, into sin if given. Only
+    the best detection's center was recorded; the others are copies of it.
+    """
+    if sin is None:
+        sin = SensorInputs()
+    sin.lidar_distance = float(tick["lidar_distance"])
+    sin.ultrasonic_distance = float(tick["ultrasonic_distance"])
+    sin.ultrasonic_age = float(tick["ultrasonic_age"])
+    sin.detections = ((int(tick["detection_x"]), int(tick["detection_y"]), 1.0),) * int(tick["detections"])
+    sin.detection_age = float(tick["detection_age"])
+    return sin
+
+
+class Replay:
+    """
+    Feeds a recorded session (see autopilot/recorder.py) through a fresh
+    pilot's run_step on a virtual clock set to the recorded timestamps.
+    The Commands and states it produces are compared with the recording,
+    and each run_step call is timed.
+
+    Each tick's safety reflex state is replayed through the reflex event,
+    and the virtual clock reads the time run_step recorded for the tick.
+
+    A recording only replays exactly from the start of its session; once
+    the recorder's ring buffer has wrapped, the pilot's earlier state is
+    lost and the first ticks will differ.
+
+    frames, a list of (monotonic time, image) pairs, and detect, a callable
+    returning detections for an image (e.g. FlyYOLO().get_detection_centers),
+    replace the recorded detections with fresh ones from the newest frame at
+    each tick.
+    """
+    TOLERANCE = 1e-3  # Commands are recorded as float32
+
+    def __init__(self, pilot, ticks, state_names=(), frames=None, detect=None):
+        self.pilot = pilot
+        self.ticks = ticks
+        self.state_names = state_names
+        self.frames = frames
+        self.detect = detect
+        self.clock = VirtualClock()
+        pilot.clock = self.clock.monotonic
+        pilot.wait = self.clock.sleep
+        pilot.recorder = None
+        self.reflex = threading.Event()
+        pilot.attach_reflex(self.reflex)
+        self.compute_time = []
+        self.mismatches = []  # (tick index, field, recorded, replayed)
+
+    def _detections(self, sin, now):
+        i = bisect.bisect_right(self.frames, now, key=lambda frame: frame[0]) - 1
+        if i < 0:
+            sin.detections, sin.detection_age = (), float('inf')
+            return
+        captured, image = self.frames[i]
+        sin.detections = tuple(self.detect(image))
+        sin.detection_age = now - captured
+
+    def run(self):
+        names = self.pilot.STATE_NAMES
+        sin = SensorInputs()
+        # recordings made before the reflex state was recorded
+        has_reflex = "reflex" in self.ticks.dtype.names
+        for i, tick in enumerate(self.ticks):
+            self.clock.now = float(tick["time"])
+            sensor_inputs(tick, sin)
+            if has_reflex and tick["reflex"]:
+                self.reflex.set()
+            else:
+                self.reflex.clear()
+            if self.frames is not None:
+                self._detections(sin, self.clock.now)
+            start = time.perf_counter()
+            cmd = self.pilot.run_step(sin)
+            self.compute_time.append(time.perf_counter() - start)
+            for field in COMMAND_FIELDS:
+                recorded = float(tick[field])
+                replayed = getattr(cmd, field)
+                if abs(recorded - replayed) > self.TOLERANCE:
+                    self.mismatches.append((i, field, recorded, replayed))
+            if self.state_names:
+                recorded = self.state_names[tick["state"]]
+                replayed = names[self.pilot.state]
+                if recorded != replayed:
+                    self.mismatches.append((i, "state", recorded, replayed))
+        return self.report()
+
+    def report(self):
+        ordered = sorted(self.compute_time)
+        n = len(ordered)
+
+        def percentile(p):
+            return ordered[min(n - 1, int(n * p))] * 1e6 if n else 0.0
+
+        return {
+            "ticks": n,
+            "mismatches": len(self.mismatches),
+            "first_mismatch": self.mismatches[0] if self.mismatches else None,
+            "compute_us": {
+                "p50": percentile(0.5),
+                "p99": percentile(0.99),
+                "max": ordered[-1] * 1e6 if n else 0.0,
+                "mean": sum(ordered) / n * 1e6 if n else 0.0,
+            },
+        }
+
+
+def replay_file(pilot_spec, path):
+    ticks, state_names = load(path)
+    replay = Replay(load_pilot(pilot_spec)(), ticks, state_names)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        return replay.run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded sessions through an autopilot")
+    parser.add_argument("recordings", nargs="+", help=".npz files written by FlightRecorder")
+    parser.add_argument("--pilot", default="autopilot.autodrive:AutoDrivePilot",
+                        help="pilot class as module:Class, constructed without arguments")
+    parser.add_argument("--json", help="write the per-session reports to this file")
+    args = parser.parse_args()
+
+    reports = {}
+    for path in args.recordings:
+        report = replay_file(args.pilot, path)
+        reports[path] = report
+        c = report["compute_us"]
+        print(f"{path}: {report['ticks']} ticks, {report['mismatches']} mismatches, "
+              f"run_step p50 {c['p50']:.1f} us, p99 {c['p99']:.1f} us, max {c['max']:.1f} us")
+        if report["first_mismatch"]:
+            i, field, recorded, replayed = report["first_mismatch"]
+            print(f"  first mismatch at tick {i}: {field} recorded {recorded}, replayed {replayed}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(reports, f, indent=2)
+    # non-zero exit when any session diverged, for use as a regression check
+    sys.exit(1 if any(r["mismatches"] for r in reports.values()) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+import argparse
+import contextlib
+import importlib
+import json
+import math
+import time
+from autopilot.autopilot import SensorInputs
+from simulation.vehicle import Vehicle
+from simulation.world import World
+
+
+class VirtualClock:
+    """
+    Simulated monotonic clock. sleep() advances time instantly and calls
+    on_advance(dt), so the world moves while the autopilot "sleeps".
+    """
+
+    def __init__(self, on_advance=None):
+        self.now = 0.0
+        self.on_advance = on_advance
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, dt):
+        if dt <= 0:
+            return
+        self.now += dt
+        if self.on_advance is not None:
+            self.on_advance(dt)
+
+
+class Simulation:
+    """
+    Runs an Autopilot against a World on a virtual clock.
+
+    The pilot's clock is replaced, so Autopilot.sleep returns at once after
+    stepping the vehicle through the tick. Each tick synthesizes
+    SensorInputs from the vehicle pose: lidar along the pan angle,
+    ultrasonic straight ahead, and fly detections in the camera's field of
+    view. The Command is applied as is, without actuation latency; pass a
+    Vehicle with motor_accel to ramp drive power as motion profiles do.
+
+        sim = Simulation(AutoDrivePilot(), World.random(seed=1))
+        print(sim.run(600))
+    """
+    DT = 0.01                   # seconds per physics step
+    LIDAR_RANGE = 800           # cm
+    ULTRASONIC_RANGE = 300      # cm
+    CAMERA_FOV = math.radians(60)
+    CAMERA_RANGE = 150          # cm
+    CAMERA_SIZE = (640, 480)
+    COVERAGE_CELL = 20          # cm, grid cell size for coverage
+
+    def __init__(self, pilot, world, vehicle=None):
+        self.pilot = pilot
+        self.world = world
+        self.vehicle = vehicle if vehicle is not None else Vehicle(world.width / 2, world.height / 2)
+        self.clock = VirtualClock(self._advance)
+        pilot.clock = self.clock.monotonic
+        pilot.wait = self.clock.sleep
+        self.ticks = 0
+        self.flies_seen = set()
+        self.all_flies_time = None  # Sim time when the last fly was first seen
+        self.visited = set()
+        self.wall_time = 0.0
+        self.sensor_inputs = SensorInputs()  # updated in place every tick, as on the car
+
+    def _advance(self, dt):
+        while dt > 1e-9:
+            step = min(self.DT, dt)
+            self.vehicle.advance(step, self.world)
+            dt -= step
+
+    def sense(self):
+        v = self.vehicle
+        sin = self.sensor_inputs
+        sin.lidar_distance = self.world.ray(v.x, v.y, v.pan_heading(), self.LIDAR_RANGE)
+        ultrasonic = self.world.ray(v.x, v.y, v.heading, self.ULTRASONIC_RANGE)
+        sin.ultrasonic_distance = ultrasonic if ultrasonic < self.ULTRASONIC_RANGE else float('inf')
+        sin.ultrasonic_age = 0.0
+        width, height = self.CAMERA_SIZE
+        detections = []
+        for i, bearing in self.world.visible_flies(v.x, v.y, v.pan_heading(), self.CAMERA_FOV, self.CAMERA_RANGE):
+            if i not in self.flies_seen:
+                self.flies_seen.add(i)
+                if len(self.flies_seen) == len(self.world.flies):
+                    self.all_flies_time = self.clock.now
+            # bearing is counter-clockwise, image x grows to the right
+            x = width / 2 - bearing / (self.CAMERA_FOV / 2) * width / 2
+            detections.append((int(x), height // 2, 1.0))
+        sin.detections = tuple(detections)
+        sin.detection_age = 0.0
+        return sin
+
+    def step(self):
+        """
+        Run one autopilot tick and return its Command.
+        """
+        self.pilot.sleep()
+        cmd = self.pilot.run_step(self.sense())
+        self.vehicle.command(cmd)
+        self.visited.add((int(self.vehicle.x // self.COVERAGE_CELL), int(self.vehicle.y // self.COVERAGE_CELL)))
+        self.ticks += 1
+        return cmd
+
+    def run(self, duration):
+        """
+        Simulate `duration` seconds and return metrics().
+        """
+        start = time.perf_counter()
+        end = self.clock.now + duration
+        while self.clock.now < end:
+            self.step()
+        self.wall_time += time.perf_counter() - start
+        return self.metrics()
+
+    def metrics(self):
+        sim_time = self.clock.now
+        distance = self.vehicle.odometer / 100
+        cells = math.ceil(self.world.width / self.COVERAGE_CELL) * math.ceil(self.world.height / self.COVERAGE_CELL)
+        return {
+            "sim_time_s": sim_time,
+            "wall_time_s": self.wall_time,
+            "speedup": sim_time / self.wall_time if self.wall_time else float('inf'),
+            "ticks": self.ticks,
+            "distance_m": distance,
+            "distance_per_min_m": distance / sim_time * 60 if sim_time else 0.0,
+            "collisions": self.vehicle.collisions,
+            "flies_seen": len(self.flies_seen),
+            "flies": len(self.world.flies),
+            "all_flies_time_s": self.all_flies_time,
+            "coverage": len(self.visited) / cells,
+            "coverage_per_min": len(self.visited) / cells / sim_time * 60 if sim_time else 0.0,
+            "state_time_s": {name: ticks * self.pilot.FREQ
+                             for name, ticks in zip(self.pilot.STATE_NAMES, self.pilot.state_ticks) if ticks},
+            "transitions": {f"{a}->{b}": n for (a, b), n in self.pilot.transition_counts().items()},
+        }
+
+
+def load_pilot(spec):
+    """
+    Import a pilot class from "module:Class", e.g. "autopilot.autodrive:AutoDrivePilot".
+    """
+    module, _, name = spec.partition(":")
+    return getattr(importlib.import_module(module), name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run an autopilot in the headless simulator")
+    parser.add_argument("--pilot", default="autopilot.autodrive:AutoDrivePilot",
+                        help="pilot class as module:Class, constructed without arguments")
+    parser.add_argument("--duration", type=float, default=600, help="simulated seconds")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random world")
+    parser.add_argument("--verbose", action="store_true", help="show the pilot's own output")
+    parser.add_argument("--ramp", action="store_true",
+                        help="ramp drive power up as Picarx motion profiles do (Vehicle.MOTOR_ACCEL)")
+    args = parser.parse_args()
+
+    pilot_class = load_pilot(args.pilot)
+    world = World.random(args.seed)
+    vehicle = Vehicle(world.width / 2, world.height / 2, motor_accel=Vehicle.MOTOR_ACCEL) if args.ramp else None
+    sim = Simulation(pilot_class(), world, vehicle)
+    if args.verbose:
+        metrics = sim.run(args.duration)
+    else:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            metrics = sim.run(args.duration)
+    print(json.dumps(metrics, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+import argparse
+import contextlib
+import csv
+import itertools
+import time
+from concurrent.futures import ProcessPoolExecutor
+from simulation.runner import Simulation, load_pilot
+from simulation.world import World
+
+# Hand-tuned defaults of Autopilot, bracketed
+DEFAULT_GRID = {
+    "D_THRESHOLD_BASE": [25, 35, 45],
+    "D_THRESHOLD_INC": [10, 20],
+    "base_speed": [30, 50, 70],
+    "TURN_TIME": [2.5, 3.0, 3.5],
+    "CRUISE_SPEED": [2.0],
+}
+COLLISION_PENALTY = 0.02  # Coverage given up per collision per minute in the score
+
+
+def evaluate(pilot_spec, params, seed, duration):
+    """
+    Simulate one parameter set in one seeded world. Runs in a pool worker.
+
+    Parameters are set on the pilot instance, so class constants and
+    instance attributes (e.g. base_speed) can both be swept. The vehicle
+    keeps its own calibration, so sweeping TURN_TIME or CRUISE_SPEED tests
+    what happens when the pilot's model of the car is off.
+    """
+    pilot = load_pilot(pilot_spec)()
+    for name, value in params.items():
+        setattr(pilot, name, value)
+    pilot.d_threshold = pilot.D_THRESHOLD_BASE
+    sim = Simulation(pilot, World.random(seed))
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        metrics = sim.run(duration)
+    return params, seed, metrics
+
+
+def aggregate(results):
+    """
+    Average the runs of each parameter set.
+
+    Returns:
+        list: one row per parameter set, best score first
+    """
+    groups = {}
+    for params, seed, metrics in results:
+        groups.setdefault(tuple(sorted(params.items())), []).append(metrics)
+    rows = []
+    for key, runs in groups.items():
+        n = len(runs)
+        minutes = sum(m["sim_time_s"] for m in runs) / 60
+        goals = [m["all_flies_time_s"] for m in runs if m["all_flies_time_s"] is not None]
+        row = dict(key)
+        row["runs"] = n
+        row["coverage"] = sum(m["coverage"] for m in runs) / n
+        row["goal_rate"] = len(goals) / n
+        row["time_to_goal_s"] = sum(goals) / len(goals) if goals else None
+        row["collisions_per_min"] = sum(m["collisions"] for m in runs) / minutes
+        row["distance_per_min_m"] = sum(m["distance_m"] for m in runs) / minutes
+        row["score"] = row["coverage"] - COLLISION_PENALTY * row["collisions_per_min"]
+        rows.append(row)
+    rows.sort(key=lambda r: r["score"], reverse=True)
+    return rows
+
+
+def format_table(rows, limit=None):
+    if not rows:
+        return ""
+    columns = list(rows[0])
+
+    def cell(value):
+        if value is None:
+            return "-"
+        if isinstance(value, float):
+            return f"{value:.3f}"
+        return str(value)
+
+    body = [[cell(row[c]) for c in columns] for row in rows[:limit]]
+    widths = [max(len(c), *(len(line[i]) for line in body)) for i, c in enumerate(columns)]
+    lines = ["  ".join(c.rjust(w) for c, w in zip(columns, widths))]
+    lines += ["  ".join(v.rjust(w) for v, w in zip(line, widths)) for line in body]
+    return "\n".join(lines)
+
+
+def parse_param(text):
+    """
+    Parse NAME=v1,v2,... into (NAME, [values]), values as int or float.
+    """
+    name, _, values = text.partition("=")
+    if not values:
+        raise argparse.ArgumentTypeError(f"Expected NAME=v1,v2,... got {text!r}")
+    return name, [float(v) if "." in v else int(v) for v in values.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep autopilot parameters in the simulator")
+    parser.add_argument("--pilot", default="autopilot.autodrive:AutoDrivePilot",
+                        help="pilot class as module:Class, constructed without arguments")
+    parser.add_argument("--param", type=parse_param, action="append", default=[],
+                        help="NAME=v1,v2,... to sweep, replaces the default grid; repeatable")
+    parser.add_argument("--scenarios", type=int, default=8, help="seeded worlds per parameter set")
+    parser.add_argument("--duration", type=float, default=300, help="simulated seconds per run")
+    parser.add_argument("--workers", type=int, default=None, help="pool size, default one per CPU")
+    parser.add_argument("--top", type=int, default=10, help="rows to print")
+    parser.add_argument("--csv", help="write every aggregated row to this file")
+    args = parser.parse_args()
+
+    grid = dict(args.param) if args.param else DEFAULT_GRID
+    names = list(grid)
+    combos = [dict(zip(names, values)) for values in itertools.product(*grid.values())]
+    jobs = [(params, seed) for params in combos for seed in range(args.scenarios)]
+    print(f"{len(combos)} parameter sets x {args.scenarios} scenarios = {len(jobs)} runs")
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(args.workers) as pool:
+        futures = [pool.submit(evaluate, args.pilot, params, seed, args.duration) for params, seed in jobs]
+        results = [f.result() for f in futures]
+    elapsed = time.perf_counter() - start
+    simulated = len(jobs) * args.duration
+    print(f"Simulated {simulated / 3600:.1f} h in {elapsed:.1f} s")
+
+    rows = aggregate(results)
+    print(format_table(rows, args.top))
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+import math
+from autopilot.autopilot import Autopilot
+
+
+def constrain(x, min_val, max_val):
+    return max(min_val, min(max_val, x))
+
+
+class Vehicle:
+    """
+    Kinematic model of the Picar-X driven by autopilot Commands.
+
+    Commands are mixed into wheel powers the way Picarx does it: the
+    steering angle is clamped to DIR_MAX, and a differential of up to 200
+    power, scaled by angle / DIR_MAX, is added to the outer wheel and taken
+    from the inner one. Each wheel is then clamped to +-100. A full-lock
+    command at zero speed therefore spins the car in place, as
+    Autopilot.turn expects. The wheels are integrated as a differential
+    drive.
+
+    By default, speed and turn rate match the autopilot's own constants:
+    power 100 covers a meter in CRUISE_SPEED seconds, and a full-lock spin
+    takes TURN_TIME seconds per revolution. Commands apply at once unless
+    motor_accel is given, e.g. MOTOR_ACCEL: then drive power ramps up
+    towards the commanded speed at that rate, like Picarx with motion
+    profiles enabled, while slowing down, stopping and the way down to 0
+    of a reversal still take effect at once, as with Picarx.MOTOR_DECEL.
+    Over 300 s on World.random seeds 0-3, AutoDrivePilot collides 1/1/2/1
+    times without the ramp and 4/2/3/5 with it. Compare collision counts
+    within one model only.
+
+    deadband makes the response non-linear like a real gear motor: wheels
+    below that power stall, and the rest of the range maps linearly up to
+    max_speed at power 100.
+    """
+    DIR_MAX = 30
+    RADIUS = 12  # cm, for collisions
+    MOTOR_ACCEL = 200  # power per second, as Picarx.MOTOR_ACCEL
+
+    def __init__(self, x, y, heading=0.0, max_speed=100 / Autopilot.CRUISE_SPEED,
+                 turn_time=Autopilot.TURN_TIME, deadband=0, motor_accel=None):
+        """
+        Args:
+            max_speed (float): wheel speed at power 100, cm/s
+            turn_time (float): seconds per revolution spinning in place at full lock
+            deadband (float): wheel power below which the wheels stall
+            motor_accel (float): drive power per second, None for no ramp
+        """
+        self.x = x
+        self.y = y
+        self.heading = heading
+        self.max_speed = max_speed
+        self.deadband = deadband
+        self.motor_accel = motor_accel
+        # a spin is both wheels at max_speed in opposite directions
+        self.track = 2 * max_speed * turn_time / (2 * math.pi)
+        self.speed = 0
+        self.target_speed = 0
+        self.angle = 0
+        self.v = 0.0      # cm/s, updated on command
+        self.omega = 0.0  # rad/s, counter-clockwise
+        self.pan = 0
+        self.tilt = 0
+        self.odometer = 0.0  # cm travelled, either direction
+        self.collisions = 0
+        self.colliding = False
+
+    def command(self, cmd):
+        self.target_speed = target = constrain(cmd.speed, -100, 100)
+        if self.motor_accel is None:
+            self.speed = target
+        elif self.speed != 0 and (target * self.speed <= 0 or abs(target) < abs(self.speed)):
+            # slowing down is not ramped, as Picarx.MOTOR_DECEL; a reversal
+            # cuts to 0 and ramps up from there
+            self.speed = target if target * self.speed > 0 else 0
+        self.angle = constrain(cmd.angle, -self.DIR_MAX, self.DIR_MAX)
+        self.pan = cmd.pan
+        self.tilt = cmd.tilt
+        self._update_velocity()
+
+    def _update_velocity(self):
+        left, right = self.wheel_powers()
+        v_left = self.wheel_speed(left)
+        v_right = self.wheel_speed(right)
+        self.v = (v_left + v_right) / 2
+        self.omega = (v_right - v_left) / self.track
+
+    def wheel_speed(self, power):
+        if abs(power) <= self.deadband:
+            return 0.0
+        speed = (abs(power) - self.deadband) / (100 - self.deadband) * self.max_speed
+        return speed if power > 0 else -speed
+
+    def wheel_powers(self):
+        differential = 200 * abs(self.angle) / self.DIR_MAX
+        if self.angle > 0:
+            # turning right: outer (left) wheel speeds up
+            left, right = self.speed + differential, self.speed - differential
+        elif self.angle < 0:
+            left, right = self.speed - differential, self.speed + differential
+        else:
+            left = right = self.speed
+        return constrain(left, -100, 100), constrain(right, -100, 100)
+
+    def advance(self, dt, world):
+        """
+        Move for dt seconds. A move into a wall or obstacle is refused and
+        counted as one collision until the vehicle gets clear again.
+        """
+        if self.speed != self.target_speed:
+            change = self.motor_accel * dt
+            self.speed += constrain(self.target_speed - self.speed, -change, change)
+            self._update_velocity()
+        v = self.v
+        heading = self.heading + self.omega * dt
+        if v == 0:
+            self.heading = heading
+            return
+        mid = (self.heading + heading) / 2
+        x = self.x + v * math.cos(mid) * dt
+        y = self.y + v * math.sin(mid) * dt
+        if world.collides(x, y, self.RADIUS):
+            if not self.colliding:
+                self.collisions += 1
+            self.colliding = True
+            self.heading = heading
+            return
+        self.colliding = False
+        self.odometer += abs(v) * dt
+        self.x, self.y, self.heading = x, y, heading
+
+    def pan_heading(self):
+        """
+        Heading the camera and lidar look along; positive pan is to the right.
+        """
+        return self.heading - math.radians(self.pan)
@@ -0,0 +1,128 @@
+import math
+import random
+
+
+class World:
+    """
+    Flat 2D world for the simulator, in centimeters.
+
+    Walls are segments (x1, y1, x2, y2), obstacles are circles (x, y, r)
+    and flies are points (x, y). The outer boundary is walled in.
+    Headings are in radians, counter-clockwise from the +x axis.
+    """
+
+    def __init__(self, width=400, height=300):
+        self.width = width
+        self.height = height
+        self.walls = []
+        self.obstacles = []
+        self.flies = []
+        corners = [(0, 0), (width, 0), (width, height), (0, height)]
+        for (x1, y1), (x2, y2) in zip(corners, corners[1:] + corners[:1]):
+            self.add_wall(x1, y1, x2, y2)
+
+    @classmethod
+    def random(cls, seed, width=400, height=300, obstacles=6, flies=4, clearance=40):
+        """
+        Build a reproducible world with random round obstacles and flies,
+        keeping a clear area of `clearance` cm around the center, where the
+        vehicle starts.
+        """
+        rng = random.Random(seed)
+        world = cls(width, height)
+        cx, cy = width / 2, height / 2
+
+        def place(radius):
+            for _ in range(100):
+                x = rng.uniform(radius, width - radius)
+                y = rng.uniform(radius, height - radius)
+                if math.hypot(x - cx, y - cy) > clearance + radius:
+                    return x, y
+            return None
+
+        for _ in range(obstacles):
+            radius = rng.uniform(8, 25)
+            spot = place(radius)
+            if spot is not None:
+                world.add_obstacle(spot[0], spot[1], radius)
+        for _ in range(flies):
+            spot = place(5)
+            if spot is not None:
+                world.add_fly(*spot)
+        return world
+
+    def add_wall(self, x1, y1, x2, y2):
+        self.walls.append((x1, y1, x2, y2))
+
+    def add_obstacle(self, x, y, radius):
+        self.obstacles.append((x, y, radius))
+
+    def add_fly(self, x, y):
+        self.flies.append((x, y))
+
+    def ray(self, x, y, heading, max_range):
+        """
+        Distance from (x, y) to the first wall or obstacle along heading,
+        or max_range if nothing is hit within it.
+        """
+        dx, dy = math.cos(heading), math.sin(heading)
+        best = max_range
+        for x1, y1, x2, y2 in self.walls:
+            ex, ey = x2 - x1, y2 - y1
+            denom = dx * ey - dy * ex
+            if denom == 0:
+                continue
+            fx, fy = x1 - x, y1 - y
+            t = (fx * ey - fy * ex) / denom
+            u = (fx * dy - fy * dx) / denom
+            if 0 <= t < best and 0 <= u <= 1:
+                best = t
+        for ox, oy, radius in self.obstacles:
+            fx, fy = ox - x, oy - y
+            along = fx * dx + fy * dy
+            if along < 0:
+                continue
+            miss = fx * fx + fy * fy - along * along
+            if miss > radius * radius:
+                continue
+            t = along - math.sqrt(radius * radius - miss)
+            if 0 <= t < best:
+                best = t
+        return best
+
+    def collides(self, x, y, radius):
+        """
+        True if a circle of radius at (x, y) touches a wall or obstacle.
+        """
+        for x1, y1, x2, y2 in self.walls:
+            ex, ey = x2 - x1, y2 - y1
+            length = ex * ex + ey * ey
+            u = 0.0 if length == 0 else max(0.0, min(1.0, ((x - x1) * ex + (y - y1) * ey) / length))
+            if math.hypot(x1 + u * ex - x, y1 + u * ey - y) < radius:
+                return True
+        for ox, oy, r in self.obstacles:
+            if math.hypot(ox - x, oy - y) < r + radius:
+                return True
+        return False
+
+    def visible_flies(self, x, y, heading, fov, max_range):
+        """
+        Flies within fov radians around heading, closer than max_range and
+        not hidden behind a wall or obstacle.
+
+        Returns:
+            list: (index, bearing) per visible fly, bearing relative to heading
+        """
+        seen = []
+        for i, (fx, fy) in enumerate(self.flies):
+            distance = math.hypot(fx - x, fy - y)
+            if distance > max_range:
+                continue
+            bearing = math.atan2(fy - y, fx - x) - heading
+            bearing = (bearing + math.pi) % (2 * math.pi) - math.pi
+            if abs(bearing) > fov / 2:
+                continue
+            if self.ray(x, y, heading + bearing, distance) < distance:
+                continue
+            seen.append((i, bearing))
+        return seen
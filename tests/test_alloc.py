@@ -0,0 +1,35 @@
+import os
+import sys
+import unittest
+sys.path.append(os.path.dirname(os.path.abspath(__file__)) + "/..")
+from benchmark import alloc
+from simulation.runner import load_pilot
+
+
+class SteadyStateAllocationTest(unittest.TestCase):
+    """
+    The shipped pilots' ticks stay within the allowances documented in
+    benchmark/alloc.py, cruising, scanning and turning alike.
+    """
+
+    def test_pilots(self):
+        for spec in alloc.PILOTS:
+            with self.subTest(pilot=spec):
+                net, map_growth, transient = alloc.measure(load_pilot(spec))
+                self.assertEqual(alloc.check(net, map_growth, transient), [])
+
+    def test_leak_is_caught(self):
+        # the allowance is a fixed number of bytes, so a pilot keeping one
+        # small object per tick exceeds it over a run of TICKS
+        leaks = []
+
+        class LeakyPilot(load_pilot(alloc.PILOTS[0])):
+            def begin_step(self):
+                leaks.append(object())
+
+        net, map_growth, transient = alloc.measure(LeakyPilot)
+        self.assertNotEqual(alloc.check(net, map_growth, transient), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+import multiprocessing as mp
+import queue
+import time
+
+
+def _default_model():
+    from vision.fly.detect import FlyYOLO
+    return FlyYOLO()
+
+
+def _default_camera():
+    from sensors.camera import get_camera_instance
+    return get_camera_instance()
+
+
+def _publish(results, item):
+    """
+    Put item into a single-slot queue, replacing an unread result.
+    """
+    while True:
+        try:
+            results.put_nowait(item)
+            return
+        except queue.Full:
+            try:
+                results.get_nowait()
+            except queue.Empty:
+                pass
+
+
+def _perceive(results, stop, processed, model_factory, camera_factory, min_interval):
+    camera = camera_factory()
+    model = model_factory()
+    failures = 0
+    while not stop.is_set():
+        started = time.monotonic()
+        frame = camera.capture_frame()
+        if frame is None:
+            stop.wait(0.05)
+            continue
+        # stamp the capture, not the end of inference, so the age includes it
+        captured = time.monotonic()
+        try:
+            detections = model.get_detection_centers(frame)
+        except Exception as e:
+            # report the first of a run of failures, and keep the throttle
+            if not failures:
+                print(f"Perception failed: {e}")
+            failures += 1
+        else:
+            if failures:
+                print(f"Perception recovered after {failures} failed frames")
+                failures = 0
+            _publish(results, (detections, captured, time.monotonic() - captured))
+            with processed.get_lock():
+                processed.value += 1
+        delay = min_interval - (time.monotonic() - started)
+        if delay > 0:
+            stop.wait(delay)
+
+
+class PerceptionWorker:
+    """
+    Runs fly detection in a separate process, off the control loop.
+
+    One YOLO inference takes hundreds of milliseconds on the Pi, and a
+    thread would still hold the GIL for most of it. The worker process owns
+    the camera and the model, grabs the newest frame, runs the model on it
+    and publishes (detections, capture time) into a single-slot queue, so
+    stale results are replaced rather than queued. The control loop reads
+    the newest result with latest(), which never blocks.
+
+    The worker is forked, so start it before opening the camera or starting
+    other threads in the parent.
+
+        perception = PerceptionWorker().start()
+        detections, age = perception.latest()
+    """
+
+    def __init__(self, model_factory=_default_model, camera_factory=_default_camera, min_interval=0.0,
+                 profiler=None):
+        """
+        Args:
+            model_factory: callable returning an object with get_detection_centers(frame),
+                           called in the worker process
+            camera_factory: callable returning an object with capture_frame(), called in
+                            the worker process
+            min_interval (float): minimum time between two inferences, in seconds
+            profiler: optional PhaseProfiler that gets each result's inference
+                      time as "perception"
+        """
+        ctx = mp.get_context("fork")
+        self._results = ctx.Queue(maxsize=1)
+        self._stop = ctx.Event()
+        self.processed = ctx.Value('L', 0)
+        self._process = ctx.Process(
+            target=_perceive, name="perception", daemon=True,
+            args=(self._results, self._stop, self.processed, model_factory, camera_factory, min_interval))
+        self._latest = ([], 0.0)
+        self.inference_time = None  # Seconds the newest result took
+        self.profiler = profiler
+
+    def start(self):
+        if not self._process.is_alive():
+            self._process.start()
+        return self
+
+    def close(self, timeout=2.0):
+        self._stop.set()
+        if self._process.pid is not None:
+            self._process.join(timeout)
+            if self._process.is_alive():
+                self._process.terminate()
+
+    def is_alive(self):
+        return self._process.is_alive()
+
+    def latest(self):
+        """
+        Get the newest detections without blocking.
+
+        Returns:
+            tuple: (detections, age in seconds since the frame was captured);
+            age is inf before the first result arrived
+        """
+        try:
+            while True:
+                detections, captured, inference_time = self._results.get_nowait()
+                self._latest = (detections, captured)
+                self.inference_time = inference_time
+                if self.profiler is not None:
+                    self.profiler.record("perception", inference_time)
+        except queue.Empty:
+            pass
+        detections, captured = self._latest
+        if not captured:
+            return detections, float('inf')
+        return detections, time.monotonic() - captured